@@ -0,0 +1,259 @@
+"""
+Write-behind activity log.
+
+Route handlers call activity_log.record(), which only appends the event to
+an in-memory queue; a writer thread per worker inserts queued events in
+batches (one executemany per batch, which pymysql sends as a multi-row
+INSERT) once ACTIVITY_BATCH_SIZE are waiting or every ACTIVITY_FLUSH_SECONDS.
+
+The queue is bounded. When it is full, new events overflow to the worker's
+spill file on disk instead of growing memory or slowing the request, and a
+batch that fails to insert (e.g. the database is down) is appended there
+too, fsync'd. Spill files are replayed once inserts succeed again, including
+files left behind by workers that have died. The queue is flushed on
+shutdown; a crash loses at most the events of one flush interval.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import insert
+from config import settings
+from database import engine
+import models, metrics
+
+logger = logging.getLogger(__name__)
+
+# Event names
+REGISTER = "register"
+LOGIN = "login"
+LOGIN_FAILED = "login_failed"
+PROFILE_UPDATE = "profile_update"
+RESUME_UPLOAD = "resume_upload"
+
+EVENTS = metrics.registry.register(metrics.Counter(
+    "activity_events_total", "Activity events by outcome", ("outcome",)))
+
+# spill-<pid>.ndjson is appended to by worker <pid>; replay-<pid>-<n>.ndjson
+# has been claimed for replay by worker <pid>
+_SPILL_FILE = re.compile(r"(spill|replay)-(\d+)(?:-\d+)?\.ndjson")
+
+
+def _now() -> datetime:
+    # Naive UTC: the time the event happened, not when its batch was written
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _dump(row: dict) -> str:
+    return json.dumps({**row, "created_at": row["created_at"].isoformat()}, separators=(",", ":")) + "\n"
+
+
+def _load(line: str) -> dict:
+    row = json.loads(line)
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+class ActivityLog:
+    """Bounded event queue drained by a background writer thread"""
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_queue: int,
+                 spill_dir: str, max_spill_bytes: int, replay_seconds: float):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.replay_seconds = replay_seconds
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._next_replay = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def record(self, event: str, user_id: Optional[int] = None, ip: Optional[str] = None, **detail):
+        """Queue an event; never blocks on the database"""
+        if not settings.ACTIVITY_LOG_ENABLED:
+            return
+        row = {
+            "user_id": user_id,
+            "event": event,
+            "ip": ip,
+            "detail": json.dumps(detail, separators=(",", ":"), default=str) if detail else None,
+            "created_at": _now(),
+        }
+        with self._cond:
+            if len(self._queue) < self.max_queue:
+                self._queue.append(row)
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify()
+                EVENTS.inc("queued")
+                return
+        # The writer is behind: keep the event on disk rather than in memory
+        self._spill([row], sync=False)
+
+    # Writer thread
+
+    def start(self):
+        """Start the writer thread for this process"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush queued events and stop the writer"""
+        with self._cond:
+            thread, self._stopping = self._thread, True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+        elif self._queue:
+            self._drain()
+
+    def _run(self):
+        self._replay()
+        self._drain()
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._queue) >= self.batch_size,
+                    timeout=self.flush_seconds,
+                )
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                stopping = self._stopping
+            if batch:
+                if self._write(batch) and time.monotonic() >= self._next_replay:
+                    self._replay()
+            elif stopping:
+                return
+            elif time.monotonic() >= self._next_replay:
+                self._replay()
+
+    def _write(self, rows: List[dict]) -> bool:
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(models.ActivityEvent.__table__), rows)
+        except Exception:
+            logger.warning("Could not write %d activity events; spilling to disk", len(rows), exc_info=True)
+            self._spill(rows, sync=True)
+            # Retry the spill file later rather than on the next batch
+            self._next_replay = time.monotonic() + self.replay_seconds
+            return False
+        EVENTS.inc("written", amount=len(rows))
+        return True
+
+    # Spill files
+
+    def _spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"spill-{os.getpid()}.ndjson")
+
+    def _spill(self, rows: List[dict], sync: bool):
+        data = "".join(_dump(row) for row in rows).encode()
+        with self._spill_lock:
+            try:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                fd = os.open(self._spill_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    if os.fstat(fd).st_size + len(data) > self.max_spill_bytes:
+                        EVENTS.inc("dropped", amount=len(rows))
+                        return
+                    os.write(fd, data)
+                    if sync:
+                        os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                logger.exception("Could not spill %d activity events", len(rows))
+                EVENTS.inc("dropped", amount=len(rows))
+                return
+        EVENTS.inc("spilled", amount=len(rows))
+
+    def _claim(self, name: str) -> Optional[str]:
+        """Path of a spill file this worker may replay, renamed so no one else does"""
+        match = _SPILL_FILE.fullmatch(name)
+        if match is None:
+            return None
+        kind, owner = match.group(1), int(match.group(2))
+        path = os.path.join(self.spill_dir, name)
+        me = os.getpid()
+        if kind == "replay" and owner == me:
+            return path
+        if owner != me and _alive(owner):
+            return None
+        claimed = os.path.join(self.spill_dir, f"replay-{me}-{time.time_ns()}.ndjson")
+        try:
+            # Hold the lock for our own file so no overflow write is mid-append
+            with self._spill_lock:
+                os.rename(path, claimed)
+        except FileNotFoundError:
+            return None  # another worker claimed it first
+        return claimed
+
+    def _replay(self):
+        self._next_replay = time.monotonic() + self.replay_seconds
+        try:
+            names = sorted(os.listdir(self.spill_dir))
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = self._claim(name)
+            if path is not None and not self._replay_file(path):
+                return
+
+    def _replay_file(self, path: str) -> bool:
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(_load(line))
+                except (ValueError, KeyError):
+                    # A torn final line from a crash mid-append
+                    logger.warning("Skipping unreadable activity event in %s", path)
+        try:
+            # One transaction per file, so a failure leaves it to be retried whole
+            with engine.begin() as conn:
+                for start in range(0, len(rows), self.batch_size):
+                    conn.execute(insert(models.ActivityEvent.__table__), rows[start:start + self.batch_size])
+        except Exception:
+            logger.warning("Could not replay activity spill file %s", path, exc_info=True)
+            return False
+        os.remove(path)
+        EVENTS.inc("replayed", amount=len(rows))
+        logger.info("Replayed %d activity events from %s", len(rows), path)
+        return True
+
+
+activity_log = ActivityLog(
+    batch_size=settings.ACTIVITY_BATCH_SIZE,
+    flush_seconds=settings.ACTIVITY_FLUSH_SECONDS,
+    max_queue=settings.ACTIVITY_QUEUE_MAX,
+    spill_dir=settings.ACTIVITY_SPILL_DIR,
+    max_spill_bytes=settings.ACTIVITY_SPILL_MAX_BYTES,
+    replay_seconds=settings.ACTIVITY_REPLAY_SECONDS,
+)
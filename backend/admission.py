@@ -0,0 +1,180 @@
+"""
+Admission control for the password-hashing endpoints.
+
+Login and registration each cost a bcrypt operation, so a credential-stuffing
+burst can saturate every CPU. Before doing any work those handlers call
+admit_*(), which applies token buckets per client IP and per login
+identifier (429 when exhausted) and sheds load with a 503 once the hashing
+pool's queue is full. Both responses carry Retry-After. The availability
+check hashes nothing but is cheap to hammer (and to enumerate accounts
+with), so admit_availability() gives it an IP bucket of its own, sized for
+as-you-type use. State is in memory and per worker.
+
+Client addresses come from X-Forwarded-For only when the connecting peer is
+a proxy listed in FORWARDED_ALLOW_IPS. A forwarded request from any other
+peer is logged once per worker, since it usually means a proxy that hasn't
+been configured and every client sharing one IP bucket.
+"""
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from config import settings
+from hashing import hash_pool
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DECISIONS = metrics.registry.register(metrics.Counter(
+    "auth_admission_total", "Admission decisions for hashing endpoints", ("endpoint", "outcome")))
+
+
+class TokenBucketLimiter:
+    """Token buckets per key, refilling at rate_per_minute up to burst"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take a token for key; 0 if admitted, otherwise seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+            self._buckets[key] = (tokens, now)
+            # Least recently seen keys go first; a forgotten key starts with a full bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+ip_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST, settings.RATE_LIMIT_MAX_KEYS
+)
+login_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_LOGIN_PER_MINUTE, settings.RATE_LIMIT_LOGIN_BURST, settings.RATE_LIMIT_MAX_KEYS
+)
+availability_limiter = TokenBucketLimiter(
+    settings.RATE_LIMIT_AVAILABILITY_PER_MINUTE, settings.RATE_LIMIT_AVAILABILITY_BURST, settings.RATE_LIMIT_MAX_KEYS
+)
+
+
+def _networks(entries: list) -> list:
+    networks = []
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid FORWARDED_ALLOW_IPS entry %r", entry)
+    return networks
+
+
+_trust_all = "*" in settings.FORWARDED_ALLOW_IPS
+_trusted = _networks([entry for entry in settings.FORWARDED_ALLOW_IPS if entry != "*"])
+_warned_untrusted = False
+
+
+def _is_trusted(address: str) -> bool:
+    if _trust_all:
+        return True
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted)
+
+
+def client_ip(request: Request) -> str:
+    """The client address, taken from X-Forwarded-For when the peer is a trusted proxy"""
+    global _warned_untrusted
+    peer = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return peer
+    if not _is_trusted(peer):
+        if not _warned_untrusted:
+            _warned_untrusted = True
+            logger.warning(
+                "Got X-Forwarded-For from %s, which isn't in FORWARDED_ALLOW_IPS; rate limits apply per "
+                "proxy address, so all clients behind it share one bucket. See FORWARDED_ALLOW_IPS in "
+                "env.example.", peer
+            )
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    if _trust_all:
+        # The last entry is the one appended by our own proxy; earlier ones
+        # are whatever the client sent
+        return hops[-1] if hops else peer
+    # Walk back from the entry our proxy appended, past any further trusted
+    # proxies; the first untrusted address is the client
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def _reject(endpoint: str, outcome: str, status_code: int, detail: str, retry_after: float):
+    DECISIONS.inc(endpoint, outcome)
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _check_rate(endpoint: str, request: Request, identifier: str = None):
+    wait = ip_limiter.acquire(client_ip(request))
+    if wait:
+        raise _reject(endpoint, "rate_limited_ip", status.HTTP_429_TOO_MANY_REQUESTS,
+                      "Too many requests, please retry later", wait)
+    if identifier is not None:
+        wait = login_limiter.acquire(identifier.strip().lower())
+        if wait:
+            raise _reject(endpoint, "rate_limited_login", status.HTTP_429_TOO_MANY_REQUESTS,
+                          "Too many login attempts for this account, please retry later", wait)
+
+
+def _admit(endpoint: str, request: Request, identifier: str = None):
+    if settings.RATE_LIMIT_ENABLED:
+        _check_rate(endpoint, request, identifier)
+    # Fail before touching the database when the hash would be rejected anyway
+    if hash_pool.pending >= hash_pool.max_pending:
+        raise _reject(endpoint, "shed", status.HTTP_503_SERVICE_UNAVAILABLE,
+                      "Authentication is busy, please retry", 1)
+    DECISIONS.inc(endpoint, "admitted")
+
+
+def admit_login(request: Request, login: str):
+    """Admit a login attempt or raise 429/503"""
+    _admit("login", request, login)
+
+
+def admit_register(request: Request):
+    """Admit a registration or raise 429/503"""
+    _admit("register", request)
+
+
+def admit_availability(request: Request):
+    """Admit an availability check or raise 429"""
+    if settings.RATE_LIMIT_ENABLED:
+        wait = availability_limiter.acquire(client_ip(request))
+        if wait:
+            raise _reject("available", "rate_limited_ip", status.HTTP_429_TOO_MANY_REQUESTS,
+                          "Too many requests, please retry later", wait)
+    DECISIONS.inc("available", "admitted")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+ATS compatibility scoring.
+
+The per-role keyword sets in data/ats_keywords.json are compiled once into a
+phrase lookup table and a (terms x roles) weight matrix. Scoring a resume is
+one pass over its tokens to build a term-presence vector, then a matrix
+product against the weights; batches of resumes are scored with a single
+(resumes x terms) @ (terms x roles) product.
+
+Usage:
+    python ats_scoring.py --rescore   # recompute Resume.ats_score for every parsed resume
+"""
+
+import argparse
+import json
+import re
+import threading
+from typing import Callable, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+import models, jobs
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping symbols used in tech names (c++, node.js)"""
+    return [token.rstrip(".-") for token in _TOKEN.findall(text.lower())]
+
+
+class KeywordIndex:
+    """Compiled keyword sets for every role"""
+
+    def __init__(self, config: dict):
+        roles = config["roles"]
+        self.roles = list(roles)
+        self.titles = {role: spec.get("title", role) for role, spec in roles.items()}
+
+        self.terms: List[str] = sorted({term for spec in roles.values() for term in spec["keywords"]})
+        term_ids = {term: i for i, term in enumerate(self.terms)}
+
+        # Token tuple -> term id, for keywords and their aliases
+        self._phrases = {tuple(tokenize(term)): i for term, i in term_ids.items()}
+        for alias, term in config.get("aliases", {}).items():
+            if term in term_ids:
+                self._phrases[tuple(tokenize(alias))] = term_ids[term]
+        self._max_phrase = max((len(p) for p in self._phrases), default=1)
+        self._single = {p[0]: i for p, i in self._phrases.items() if len(p) == 1}
+        # Only tokens that start a multi-word phrase need longer lookups
+        self._phrase_starts = {p[0] for p in self._phrases if len(p) > 1}
+
+        self.weights = np.zeros((len(self.terms), len(self.roles)), dtype=np.float32)
+        for j, role in enumerate(self.roles):
+            for term, weight in roles[role]["keywords"].items():
+                self.weights[term_ids[term], j] = weight
+        self.totals = self.weights.sum(axis=0)
+        self.totals[self.totals == 0] = 1.0
+
+        self._title_phrases = {role: tuple(tokenize(title)) for role, title in self.titles.items()}
+
+    def term_vector(self, text: str) -> np.ndarray:
+        """Boolean presence vector over self.terms"""
+        tokens = tokenize(text or "")
+        single, starts, phrases = self._single, self._phrase_starts, self._phrases
+        found = {single[token] for token in set(tokens).intersection(single)}
+        for i, token in enumerate(tokens):
+            if token in starts:
+                for n in range(2, min(self._max_phrase, len(tokens) - i) + 1):
+                    term_id = phrases.get(tuple(tokens[i:i + n]))
+                    if term_id is not None:
+                        found.add(term_id)
+        present = np.zeros(len(self.terms), dtype=np.float32)
+        present[list(found)] = 1.0
+        return present
+
+    def score_matrix(self, texts: Iterable[str]) -> np.ndarray:
+        """Scores (0-100) with one row per text and one column per role"""
+        presence = np.vstack([self.term_vector(text) for text in texts])
+        return presence @ self.weights * (100.0 / self.totals)
+
+    def role_for(self, career_goals: Optional[str]) -> Optional[str]:
+        """Role whose title appears in a profile's career goals, if any"""
+        tokens = tokenize(career_goals or "")
+        joined = " " + " ".join(tokens) + " "
+        for role, phrase in self._title_phrases.items():
+            if " " + " ".join(phrase) + " " in joined:
+                return role
+        return None
+
+    def overall_scores(self, scores: np.ndarray, roles: List[Optional[str]]) -> np.ndarray:
+        """Score for each row's target role, or its best role when none is set"""
+        best = scores.max(axis=1)
+        columns = np.array([self.roles.index(role) if role in self.titles else -1 for role in roles])
+        targeted = scores[np.arange(len(roles)), np.maximum(columns, 0)]
+        return np.where(columns >= 0, targeted, best)
+
+    def score(self, text: str, role: Optional[str] = None) -> dict:
+        """Score one resume, with matched and missing keywords for the role"""
+        present = self.term_vector(text)
+        scores = present @ self.weights * (100.0 / self.totals)
+        if role not in self.titles:
+            role = self.roles[int(scores.argmax())]
+        column = self.roles.index(role)
+        wanted = self.weights[:, column] > 0
+        matched = np.flatnonzero(wanted & (present > 0))
+        # Missing keywords, heaviest first
+        missing = np.flatnonzero(wanted & (present == 0))
+        missing = missing[np.argsort(-self.weights[missing, column], kind="stable")]
+        return {
+            "role": role,
+            "title": self.titles[role],
+            "score": int(round(float(scores[column]))),
+            "matched_keywords": [self.terms[i] for i in matched],
+            "missing_keywords": [self.terms[i] for i in missing],
+            "role_scores": {r: int(round(float(s))) for r, s in zip(self.roles, scores)},
+        }
+
+
+_index: Optional[KeywordIndex] = None
+_index_lock = threading.Lock()
+
+
+def load_index(path: Optional[str] = None) -> KeywordIndex:
+    with open(path or settings.ATS_KEYWORDS_PATH, encoding="utf-8") as f:
+        return KeywordIndex(json.load(f))
+
+
+def get_index() -> KeywordIndex:
+    """The compiled keyword index, built on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_index()
+    return _index
+
+
+def reload_index() -> KeywordIndex:
+    """Recompile the keyword sets after the keyword file changed"""
+    global _index
+    index = load_index()
+    with _index_lock:
+        _index = index
+    return index
+
+
+def score_resume(text: str, career_goals: Optional[str] = None) -> int:
+    """ats_score for one resume"""
+    index = get_index()
+    scores = index.score_matrix([text])
+    return int(round(float(index.overall_scores(scores, [index.role_for(career_goals)])[0])))
+
+
+def rescore_all(db: Optional[Session] = None, batch_size: int = 500,
+                progress: Optional[Callable[[int], None]] = None) -> int:
+    """Recompute ats_score for every parsed resume, one batch per transaction
+
+    progress, if given, is called with the number rescored so far after each batch.
+    """
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    index = get_index()
+    rescored = 0
+    last_id = 0
+    try:
+        while True:
+            rows = db.execute(
+                select(models.Resume.id, models.Resume.parsed_content, models.Profile.career_goals)
+                .join(models.Profile, models.Profile.id == models.Resume.profile_id)
+                .where(models.Resume.id > last_id, models.Resume.parsed_content.is_not(None))
+                .order_by(models.Resume.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            scores = index.score_matrix([text for _, text, _ in rows])
+            overall = index.overall_scores(scores, [index.role_for(goals) for _, _, goals in rows])
+            db.execute(
+                update(models.Resume),
+                [{"id": resume_id, "ats_score": int(round(float(score)))}
+                 for (resume_id, _, _), score in zip(rows, overall)],
+            )
+            db.commit()
+            rescored += len(rows)
+            last_id = rows[-1][0]
+            if progress is not None:
+                progress(rescored)
+    finally:
+        if own_session:
+            db.close()
+    return rescored
+
+
+@jobs.handler("ats.rescore")
+def rescore_job(context: jobs.JobContext, batch_size: int = 500) -> dict:
+    """Job: reload the keyword sets and rescore every parsed resume"""
+    reload_index()
+    db = SessionLocal()
+    try:
+        total = db.execute(
+            select(func.count()).select_from(models.Resume).where(models.Resume.parsed_content.is_not(None))
+        ).scalar()
+        rescored = rescore_all(db, batch_size, progress=lambda done: context.progress(
+            100 * done / total if total else 100, f"{done} of {total} resumes rescored"
+        ))
+    finally:
+        db.close()
+    return {"rescored": rescored}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ATS scoring tools")
+    parser.add_argument("--rescore", action="store_true", help="recompute ats_score for all parsed resumes")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    if args.rescore:
+        print(f"Rescored {rescore_all(batch_size=args.batch_size)} resumes.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
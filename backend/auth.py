@@ -1,27 +1,84 @@
+import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db
-import models
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from database import get_session, run_db
+import models, metrics
 from config import settings
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from cache import TTLCache
+from hashing import pwd_context, hash_pool, HashPoolBusy
 
 # JWT token scheme
 security = HTTPBearer()
 
+# Decoded token subjects (token -> email) and user rows (id -> column values),
+# so steady-state authenticated requests skip jwt.decode and the user SELECT
+token_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+user_ids_by_email = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+_USER_COLUMNS = [column.key for column in models.User.__table__.columns]
+
 def hash_password(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.hash(password)
+    finally:
+        metrics.record_hash("hash", time.perf_counter() - started)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        metrics.record_hash("verify", time.perf_counter() - started)
+
+def _hashing_unavailable():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the hashing pool"""
+    try:
+        return await hash_pool.hash(password)
+    except HashPoolBusy:
+        metrics.HASH_REJECTED.inc("hash", "busy")
+        raise _hashing_unavailable()
+    except asyncio.TimeoutError:
+        metrics.HASH_REJECTED.inc("hash", "timeout")
+        raise _hashing_unavailable()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hash in the hashing pool"""
+    try:
+        return await hash_pool.verify(plain_password, hashed_password)
+    except HashPoolBusy:
+        metrics.HASH_REJECTED.inc("verify", "busy")
+        raise _hashing_unavailable()
+    except asyncio.TimeoutError:
+        metrics.HASH_REJECTED.inc("verify", "timeout")
+        raise _hashing_unavailable()
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify in the hashing pool; also returns a rehash when the stored cost isn't BCRYPT_ROUNDS"""
+    try:
+        return await hash_pool.verify_and_update(plain_password, hashed_password)
+    except HashPoolBusy:
+        metrics.HASH_REJECTED.inc("verify", "busy")
+        raise _hashing_unavailable()
+    except asyncio.TimeoutError:
+        metrics.HASH_REJECTED.inc("verify", "timeout")
+        raise _hashing_unavailable()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
@@ -35,7 +92,73 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+def invalidate_user(user_id: int):
+    """Drop a user's cached row so the next request reloads it"""
+    values = user_cache.pop(user_id)
+    if values is not None:
+        user_ids_by_email.pop(values["email"])
+
+# Changed users are dropped from the cache at flush and again once the
+# transaction commits, since a concurrent request may have re-cached the
+# pre-commit row in between. Bulk ORM UPDATE/DELETE statements on users clear
+# the whole cache unless they name their rows with
+# execution_options(invalidate_users=[...]); Core statements outside a Session
+# bypass this entirely. The caches are per worker: other workers can serve the
+# old row for up to AUTH_CACHE_TTL_SECONDS.
+
+def _stale_users(session: Session) -> set:
+    return session.info.setdefault("stale_users", set())
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        _stale_users(session).add(target.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_change(state):
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None and state.bind_mapper.class_ is models.User:
+        user_ids = state.execution_options.get("invalidate_users")
+        if user_ids is None:
+            state.session.info["stale_all_users"] = True
+        else:
+            _stale_users(state.session).update(user_ids)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    if session.info.pop("stale_all_users", False):
+        user_cache.clear()
+        user_ids_by_email.clear()
+    for user_id in session.info.pop("stale_users", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_users(session):
+    session.info.pop("stale_all_users", None)
+    session.info.pop("stale_users", None)
+
+def _cache_user(user: models.User):
+    values = {key: getattr(user, key) for key in _USER_COLUMNS}
+    user_cache.set(user.id, values)
+    user_ids_by_email.set(user.email, user.id)
+
+def _cached_user(email: str) -> Optional[models.User]:
+    user_id = user_ids_by_email.get(email)
+    values = user_cache.get(user_id) if user_id is not None else None
+    if values is None:
+        return None
+    # Hand out a fresh transient instance so requests never share one object
+    return models.User(**values)
+
+def _load_user(db: Session, email: str) -> Optional[models.User]:
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is not None:
+        _cache_user(user)
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_session)):
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,16 +166,32 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    token = credentials.credentials
+    email = token_cache.get(token)
+    if email is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        # Never keep a token around past its own expiry
+        token_cache.set(token, email, expires_at=payload.get("exp"))
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = _cached_user(email)
     if user is None:
-        raise credentials_exception
+        user = await run_db(db, _load_user, email)
+        if user is None:
+            raise credentials_exception
     
-    return user
\ No newline at end of file
+    return user
+
+async def get_admin_user(current_user: models.User = Depends(get_current_user)):
+    """Get current user, requiring them to be listed in ADMIN_EMAILS"""
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
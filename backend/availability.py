@@ -0,0 +1,205 @@
+"""
+Username and email availability for as-you-type signup checks.
+
+Each worker loads every taken username and email (lowercased) at startup
+into two structures keyed by a 64-bit fingerprint of the name: a Bloom
+filter, which rules out most free names in a few bit probes, and an exact
+index (a sorted numpy array, plus a set of names added since it was built)
+that confirms taken ones. Only a filter hit the index doesn't confirm, i.e.
+one of the ~1% false positives, is checked against the database. Names
+are stored lowercase, so that check is a lowercase, indexed equality.
+
+Registrations in this worker are added as they happen; users created by
+other workers are picked up by an incremental load of user ids every
+AVAILABILITY_SYNC_SECONDS, which re-reads a trailing window of ids since
+ids can commit out of order. Answers are advisory: registration still
+enforces uniqueness.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from array import array
+from typing import Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import settings
+from database import engine
+import models, metrics
+
+logger = logging.getLogger(__name__)
+
+CHECKS = metrics.registry.register(metrics.Counter(
+    "auth_availability_checks_total", "Availability lookups by how they were answered", ("answer",)))
+
+MASK = (1 << 64) - 1
+MIN_CAPACITY = 100_000
+LOAD_BATCH = 50_000
+
+# Columns checked by kind
+COLUMNS = {"username": models.User.username, "email": models.User.email}
+
+
+def fingerprint(kind: str, value: str) -> int:
+    key = f"{kind}\0{value.strip().lower()}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _step(fp: int) -> int:
+    # Second hash for double hashing, derived from the fingerprint (splitmix64
+    # finalizer) so the filter can be rebuilt from fingerprints alone
+    z = (fp ^ (fp >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK
+    return (z ^ (z >> 31)) | 1
+
+
+def _steps(fps: np.ndarray) -> np.ndarray:
+    z = (fps ^ (fps >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return (z ^ (z >> np.uint64(31))) | np.uint64(1)
+
+
+class AvailabilityIndex:
+    """Bloom filter plus exact fingerprint index of taken usernames and emails"""
+
+    # Re-read this many ids below the highest one seen: an id allocated
+    # earlier can commit after a higher one has already been synced
+    SYNC_OVERLAP_IDS = 1000
+
+    def __init__(self, error_rate: float, sync_seconds: float):
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.loaded = False
+        self._bits = bytearray()
+        self._size = 0          # filter size in bits
+        self._hashes = 0
+        self._capacity = 0
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._added: set = set()
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._added)
+
+    # Building
+
+    def _build(self, fps: np.ndarray):
+        """Replace both structures with ones holding exactly fps (caller holds the lock)"""
+        fps = np.unique(fps)
+        capacity = max(MIN_CAPACITY, 2 * len(fps))
+        size = math.ceil(-capacity * math.log(self.error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        bits = np.zeros(size, dtype=bool)
+        if len(fps):
+            steps = _steps(fps)
+            for i in range(hashes):
+                # uint64 arithmetic wraps mod 2**64, matching _positions
+                bits[(fps + np.uint64(i) * steps) % np.uint64(size)] = True
+        self._bits = bytearray(np.packbits(bits, bitorder="little").tobytes())
+        self._size, self._hashes, self._capacity = size, hashes, capacity
+        self._sorted, self._added = fps, set()
+
+    def _positions(self, fp: int):
+        step = _step(fp)
+        for i in range(self._hashes):
+            yield ((fp + i * step) & MASK) % self._size
+
+    def _contains(self, fp: int) -> bool:
+        index = int(np.searchsorted(self._sorted, np.uint64(fp)))
+        return fp in self._added or (index < len(self._sorted) and int(self._sorted[index]) == fp)
+
+    def _add(self, fp: int):
+        for position in self._positions(fp):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._added.add(fp)
+
+    def _read_users(self, after_id: int) -> Tuple[array, int]:
+        fps, last_id = array("Q"), after_id
+        users = models.User.__table__
+        query = (
+            select(users.c.id, users.c.username, users.c.email)
+            .where(users.c.id > after_id)
+            .order_by(users.c.id)
+            .execution_options(yield_per=LOAD_BATCH)
+        )
+        with engine.connect() as conn:
+            for user_id, username, email in conn.execute(query):
+                if username:
+                    fps.append(fingerprint("username", username))
+                fps.append(fingerprint("email", email))
+                last_id = user_id
+        return fps, last_id
+
+    def load(self):
+        """Build the index from every user row"""
+        started = time.perf_counter()
+        fps, last_id = self._read_users(0)
+        with self._lock:
+            self._build(np.frombuffer(fps, dtype=np.uint64) if fps else np.empty(0, dtype=np.uint64))
+            self._last_id = last_id
+            self._synced_at = time.monotonic()
+            self.loaded = True
+        logger.info("Loaded %d usernames and emails for availability checks in %.2fs",
+                    len(fps), time.perf_counter() - started)
+
+    def sync_due(self) -> bool:
+        return time.monotonic() - self._synced_at >= self.sync_seconds
+
+    def sync(self):
+        """Add users created since the last load or sync (e.g. by other workers)"""
+        if not self.loaded:
+            self.load()
+            return
+        self._synced_at = time.monotonic()
+        fps, last_id = self._read_users(max(0, self._last_id - self.SYNC_OVERLAP_IDS))
+        with self._lock:
+            for fp in fps:
+                if not self._contains(fp):
+                    self._add(fp)
+            self._last_id = max(self._last_id, last_id)
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        # Past capacity the false positive rate climbs; a large added set
+        # makes membership checks a second hash lookup for every name
+        if len(self) > self._capacity or len(self._added) > max(10_000, len(self._sorted) // 4):
+            merged = np.concatenate([self._sorted, np.fromiter(self._added, dtype=np.uint64, count=len(self._added))])
+            self._build(merged)
+
+    def add(self, username: Optional[str], email: str):
+        """Record a registration made in this worker"""
+        with self._lock:
+            if username:
+                self._add(fingerprint("username", username))
+            self._add(fingerprint("email", email))
+            self._maybe_rebuild()
+
+    # Lookups
+
+    def lookup(self, kind: str, value: str) -> Optional[bool]:
+        """True if taken, False if free, None when the database has to decide"""
+        if not self.loaded:
+            return None
+        fp = fingerprint(kind, value)
+        with self._lock:
+            if not all(self._bits[p >> 3] >> (p & 7) & 1 for p in self._positions(fp)):
+                CHECKS.inc("filter")
+                return False
+            if self._contains(fp):
+                CHECKS.inc("index")
+                return True
+        CHECKS.inc("database")
+        return None
+
+
+def exists(db: Session, kind: str, value: str) -> bool:
+    """Database check for a name the filter couldn't rule out"""
+    column = COLUMNS[kind]
+    return db.query(models.User.id).filter(column == value.strip().lower()).first() is not None
+
+
+index = AvailabilityIndex(settings.AVAILABILITY_ERROR_RATE, settings.AVAILABILITY_SYNC_SECONDS)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load test for the auth and profile hot paths.
+
+Boots main:app under uvicorn against a temporary SQLite database seeded with
+N users, drives each endpoint with a fixed number of concurrent asyncio
+clients and reports throughput and p50/p95/p99 latency. Results are written
+as JSON. The run exits non-zero when any request failed (a status of 400 or
+above, or no response), since the latencies of failed requests measure
+nothing; passing --baseline also compares against an earlier run and fails
+when a scenario regressed by more than --tolerance.
+
+Usage:
+    python benchmark.py --users 200 --requests 500 --concurrency 20 --output bench.json
+    python benchmark.py --baseline bench.json   # fail on regressions
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+from jose import jwt
+from sqlalchemy import create_engine, text
+from hashing import pwd_context
+
+PASSWORD = "Bench-Password-1"
+SECRET_KEY = "benchmark-secret-key"
+SCENARIOS = ["register", "login", "me", "get_profile", "put_profile"]
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _server_env(database_url: str, upload_dir: str) -> dict:
+    # Environment variables win over backend/.env, so the app never sees the real database
+    env = dict(os.environ)
+    # DB_REPLICA_URLS too, or reads would go to replicas of the real database
+    env.update(DATABASE_URL=database_url, DB_REPLICA_URLS="", UPLOAD_DIR=upload_dir, SECRET_KEY=SECRET_KEY)
+    # Under load nearly every login is "slow"; don't let the log drown the report
+    env.setdefault("SLOW_REQUEST_SECONDS", "60")
+    # Every simulated client shares one address and a handful of accounts
+    env.setdefault("RATE_LIMIT_ENABLED", "False")
+    return env
+
+
+def seed(database_url: str, env: dict, users: int):
+    """Create the schema and insert users (sharing one password hash) with empty profiles"""
+    subprocess.run(
+        [sys.executable, "migrate_database.py"], cwd=BACKEND_DIR, env=env, check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    # The app's context, so seeded hashes have the configured cost and logins don't rehash them
+    password_hash = pwd_context.hash(PASSWORD)
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (username, email, password_hash) VALUES (:username, :email, :password_hash)"),
+            [{"username": f"seed{i}", "email": f"seed{i}@example.com", "password_hash": password_hash}
+             for i in range(users)],
+        )
+        conn.execute(text("INSERT INTO profiles (user_id) SELECT id FROM users"))
+    engine.dispose()
+
+
+def _token(email: str) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(hours=1)
+    return jwt.encode({"sub": email, "exp": expire}, SECRET_KEY, algorithm="HS256")
+
+
+def start_server(env: dict, port: int, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not become healthy")
+
+
+def _request(scenario: str, i: int, users: int, tokens: list) -> dict:
+    """Method, path and body for request i of a scenario"""
+    user = i % users
+    if scenario == "register":
+        return {"method": "POST", "url": "/auth/register",
+                "json": {"username": f"new{i}", "email": f"new{i}@example.com", "password": PASSWORD}}
+    if scenario == "login":
+        return {"method": "POST", "url": "/auth/login",
+                "json": {"login": f"seed{user}@example.com", "password": PASSWORD}}
+    headers = {"Authorization": f"Bearer {tokens[user]}"}
+    if scenario == "me":
+        return {"method": "GET", "url": "/auth/me", "headers": headers}
+    if scenario == "get_profile":
+        return {"method": "GET", "url": "/profile/", "headers": headers}
+    return {"method": "PUT", "url": "/profile/", "headers": headers,
+            "json": {"skills": f"python, sql, request {i}"}}
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int,
+                       users: int, tokens: list) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await client.request(**_request(scenario, i, users, tokens))
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def failures(results: dict) -> list:
+    """Scenarios with failed requests, as messages"""
+    return [
+        f"{scenario}: {result['errors']} of {result['requests']} requests failed"
+        for scenario, result in results["scenarios"].items() if result["errors"]
+    ]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions beyond tolerance (throughput down or p95 up) as messages"""
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario}: throughput {current['throughput']:.1f}/s vs baseline {previous['throughput']:.1f}/s"
+            )
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: p95 {current['p95_ms']:.1f}ms vs baseline {previous['p95_ms']:.1f}ms"
+            )
+    return regressions
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    database_url = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    env = _server_env(database_url, os.path.join(workdir, "uploads"))
+    server = None
+    try:
+        print(f"Seeding {args.users} users...")
+        seed(database_url, env, args.users)
+        tokens = [_token(f"seed{i}@example.com") for i in range(args.users)]
+        port = _free_port()
+        server = start_server(env, port, args.workers)
+
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "users": args.users,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "workers": args.workers,
+            },
+            "scenarios": {},
+        }
+        for scenario in args.scenarios:
+            # Password hashing dominates these; keep their runs proportionate
+            requests = args.auth_requests if scenario in ("register", "login") else args.requests
+            result = asyncio.run(run_scenario(
+                f"http://127.0.0.1:{port}", scenario, requests, args.concurrency, args.users, tokens
+            ))
+            results["scenarios"][scenario] = result
+            print(
+                f"{scenario:<12} {result['throughput']:8.1f} req/s  p50 {result['p50_ms']:7.1f}ms  "
+                f"p95 {result['p95_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  errors {result['errors']}"
+            )
+        return results
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the auth and profile endpoints")
+    parser.add_argument("--users", type=int, default=200, help="seeded users")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per read/update scenario")
+    parser.add_argument("--auth-requests", type=int, default=100, help="requests per register/login scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failed = failures(results)
+    if failed:
+        print("Failed requests:")
+        for message in failed:
+            print(f"  {message}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for key in ("users", "requests", "concurrency", "workers", "cpus"):
+            if baseline.get("meta", {}).get(key) != results["meta"][key]:
+                print(f"Warning: {key} differs from the baseline run; numbers may not be comparable")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for message in regressions:
+                print(f"  {message}")
+        else:
+            print("No regressions against baseline.")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
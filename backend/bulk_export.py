@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Streaming export of users with their profiles and resumes, as NDJSON or CSV.
+
+Users are read joined to their profiles through one server-side cursor
+(stream_results/yield_per), one partition of rows at a time. Each
+partition's resumes are fetched with a single IN query on a second
+connection, since a streaming MySQL cursor keeps its own connection busy
+until it is exhausted. Every partition is encoded (and optionally gzipped)
+and handed on before the next is read, so memory stays flat whatever the
+table size and the export is one pass over the users table. Password
+hashes are never exported.
+
+NDJSON has one object per user with a nested profile and list of resumes;
+CSV has one row per user with the profile columns and the resumes as a
+JSON array.
+
+Usage:
+    python bulk_export.py users.ndjson
+    python bulk_export.py users.csv.gz --batch-size 5000
+    python bulk_export.py - --format csv > users.csv
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from typing import Iterator, List, Optional
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from database import engine as primary_engine
+import models
+
+DEFAULT_BATCH_SIZE = 2000
+
+_users = models.User.__table__
+_profiles = models.Profile.__table__
+_resumes = models.Resume.__table__
+
+USER_COLUMNS = ["id", "username", "email", "created_at", "updated_at"]
+PROFILE_COLUMNS = ["id", "name", "career_goals", "education", "skills", "created_at", "updated_at"]
+RESUME_COLUMNS = ["id", "filename", "content_hash", "file_size", "status", "ats_score", "created_at"]
+CSV_HEADER = USER_COLUMNS + [f"profile_{column}" for column in PROFILE_COLUMNS] + ["resumes"]
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """Guess the output format from a file name (defaults to NDJSON)"""
+    name = (filename or "").lower().removesuffix(".gz")
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _user_query():
+    columns = [_users.c[name].label(name) for name in USER_COLUMNS]
+    columns += [_profiles.c[name].label(f"profile_{name}") for name in PROFILE_COLUMNS]
+    return (
+        select(*columns)
+        .select_from(_users.outerjoin(_profiles, _profiles.c.user_id == _users.c.id))
+        .order_by(_users.c.id)
+    )
+
+
+def _resumes_by_profile(engine: Engine, profile_ids: List[int], include_content: bool) -> dict:
+    if not profile_ids:
+        return {}
+    columns = [_resumes.c[name] for name in RESUME_COLUMNS]
+    if include_content:
+        columns.append(_resumes.c.parsed_content)
+    resumes = {}
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(_resumes.c.profile_id, *columns)
+            .where(_resumes.c.profile_id.in_(profile_ids))
+            .order_by(_resumes.c.profile_id, _resumes.c.id)
+        ).mappings()
+        for row in rows:
+            resumes.setdefault(row["profile_id"], []).append(
+                {key: _value(value) for key, value in row.items() if key != "profile_id"}
+            )
+    return resumes
+
+
+def iter_records(engine: Engine = primary_engine, batch_size: int = DEFAULT_BATCH_SIZE,
+                 include_content: bool = False) -> Iterator[List[dict]]:
+    """Yield lists of user records (profile and resumes nested), one list per partition"""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(_user_query())
+        for partition in result.mappings().partitions():
+            resumes = _resumes_by_profile(
+                engine, [row["profile_id"] for row in partition if row["profile_id"] is not None], include_content
+            )
+            records = []
+            for row in partition:
+                record = {name: _value(row[name]) for name in USER_COLUMNS}
+                profile_id = row["profile_id"]
+                record["profile"] = None if profile_id is None else {
+                    name: _value(row[f"profile_{name}"]) for name in PROFILE_COLUMNS
+                }
+                record["resumes"] = resumes.get(profile_id, [])
+                records.append(record)
+            yield records
+
+
+def _ndjson(records: List[dict]) -> str:
+    return "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+
+
+def _csv_writer():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(rows: List[list]) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        return buffer.getvalue()
+    return encode
+
+
+def _csv_row(record: dict) -> list:
+    profile = record["profile"] or {}
+    return (
+        [record[name] for name in USER_COLUMNS]
+        + [profile.get(name) for name in PROFILE_COLUMNS]
+        + [json.dumps(record["resumes"], ensure_ascii=False, default=str)]
+    )
+
+
+def export(fmt: str = "ndjson", compress: bool = False, engine: Engine = primary_engine,
+           batch_size: int = DEFAULT_BATCH_SIZE, include_content: bool = False) -> Iterator[bytes]:
+    """Yield the encoded export in chunks of one partition each"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip framing
+
+    def out(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        encode = _csv_writer()
+        yield out(encode([CSV_HEADER]))
+    for records in iter_records(engine, batch_size, include_content):
+        if fmt == "csv":
+            chunk = out(encode([_csv_row(record) for record in records]))
+        else:
+            chunk = out(_ndjson(records))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export users, profiles and resumes as NDJSON or CSV")
+    parser.add_argument("path", help="output file (.gz to compress), or - for stdout")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="output format (default: from file name)")
+    parser.add_argument("--gzip", action="store_true", help="compress (implied by a .gz file name)")
+    parser.add_argument("--include-content", action="store_true", help="include extracted resume text")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    compress = args.gzip or args.path.lower().endswith(".gz")
+    stream = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+    try:
+        for chunk in export(fmt, compress, batch_size=args.batch_size, include_content=args.include_content):
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+    if args.path != "-":
+        print(f"Exported to {args.path}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
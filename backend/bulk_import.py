@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Bulk user import from CSV or NDJSON.
+
+Rows are validated with schemas.UserCreate in batches, checked for duplicates
+with one set-based query per batch, hashed in parallel in the bulk hashing
+pool and inserted (users plus their empty profiles) with executemany, one
+transaction per batch. Failed rows are reported with their line number
+instead of aborting the import; only the first MAX_REPORTED_ERRORS are kept.
+
+Uploads to POST /admin/users/import are spooled to UPLOAD_DIR/imports and
+imported by a users.import job, so the request returns as soon as the file
+is stored.
+
+Usage:
+    python bulk_import.py users.csv
+    python bulk_import.py users.ndjson --batch-size 1000
+    cat users.csv | python bulk_import.py - --format csv
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from itertools import islice
+from typing import IO, Callable, Iterable, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from hashing import HashPool, bulk_hash_pool
+from config import settings
+import models, schemas, jobs
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+# Job results are stored in a TEXT column (64 KB on MySQL)
+MAX_JOB_ERRORS = 100
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """Guess the input format from a file name (defaults to CSV)"""
+    if filename and filename.lower().endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw row) pairs from a CSV or NDJSON text stream"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {"__error__": f"Invalid JSON: {e}"}
+        yield line_number, row
+
+
+def _error(line: int, row: dict, message: str) -> dict:
+    return {
+        "line": line,
+        "email": row.get("email"),
+        "username": row.get("username"),
+        "error": message,
+    }
+
+
+def _validate(batch, seen_emails: set, seen_usernames: set, errors: list) -> list:
+    valid = []
+    for line, row in batch:
+        if not isinstance(row, dict):
+            errors.append(_error(line, {}, "Row must be an object"))
+            continue
+        if "__error__" in row:
+            errors.append(_error(line, {}, row["__error__"]))
+            continue
+        try:
+            user = schemas.UserCreate(**row)
+        except (ValidationError, TypeError) as e:
+            if isinstance(e, ValidationError):
+                message = "; ".join(err["msg"] for err in e.errors())
+            else:
+                message = str(e)
+            errors.append(_error(line, row, message))
+            continue
+        if user.email in seen_emails or user.username in seen_usernames:
+            errors.append(_error(line, row, "Duplicate user in import"))
+            continue
+        seen_emails.add(user.email)
+        seen_usernames.add(user.username)
+        valid.append((line, user))
+    return valid
+
+
+def _drop_existing(db: Session, valid: list, errors: list) -> list:
+    if not valid:
+        return valid
+    emails = [user.email for _, user in valid]
+    usernames = [user.username for _, user in valid]
+    taken = db.execute(
+        select(models.User.email, models.User.username).where(
+            or_(models.User.email.in_(emails), models.User.username.in_(usernames))
+        )
+    ).all()
+    taken_emails = {email for email, _ in taken}
+    taken_usernames = {username for _, username in taken}
+
+    fresh = []
+    for line, user in valid:
+        if user.email in taken_emails or user.username in taken_usernames:
+            errors.append(_error(line, user.model_dump(), "User already registered"))
+        else:
+            fresh.append((line, user))
+    return fresh
+
+
+def _insert(db: Session, users: list, hashes: list):
+    db.execute(
+        insert(models.User),
+        [
+            {"username": user.username, "email": user.email, "password_hash": password_hash}
+            for (_, user), password_hash in zip(users, hashes)
+        ],
+    )
+    # Look the new ids up in one query; MySQL has no INSERT ... RETURNING
+    user_ids = db.execute(
+        select(models.User.id).where(models.User.email.in_([user.email for _, user in users]))
+    ).scalars().all()
+    db.execute(insert(models.Profile), [{"user_id": user_id} for user_id in user_ids])
+
+
+def import_users(
+    rows: Iterable[Tuple[int, dict]],
+    db: Optional[Session] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    hasher: HashPool = bulk_hash_pool,
+    max_errors: int = MAX_REPORTED_ERRORS,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """Import (line, row) pairs and return a schemas.BulkImportResult dict
+
+    progress, if given, is called with the created and failed counts after each batch.
+    """
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+
+    created = 0
+    errors = []
+    seen_emails, seen_usernames = set(), set()
+    rows = iter(rows)
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            valid = _validate(batch, seen_emails, seen_usernames, errors)
+            fresh = _drop_existing(db, valid, errors)
+            if fresh:
+                hashes = hasher.hash_many([user.password for _, user in fresh])
+                try:
+                    _insert(db, fresh, hashes)
+                    db.commit()
+                    created += len(fresh)
+                except IntegrityError:
+                    # Someone registered one of these users concurrently
+                    db.rollback()
+                    for line, user in fresh:
+                        errors.append(_error(line, user.model_dump(), "User already registered"))
+            if progress is not None:
+                progress(created, len(errors))
+    finally:
+        if own_session:
+            db.close()
+
+    errors.sort(key=lambda error: error["line"])
+    return {
+        "created": created,
+        "failed": len(errors),
+        "errors": errors[:max_errors],
+        "errors_truncated": len(errors) > max_errors,
+    }
+
+
+def spool(upload: IO[bytes], fmt: str) -> str:
+    """Copy an uploaded file to UPLOAD_DIR/imports for an import job; returns its path"""
+    directory = os.path.join(settings.UPLOAD_DIR, "imports")
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix="." + fmt)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(upload, f, settings.UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def discard_spool(path: str, **_):
+    """Delete a spooled upload (the failure hook of users.import, e.g. when its worker died)"""
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+# Not retried: a second attempt would report the rows the first one created as duplicates
+@jobs.handler("users.import", max_attempts=1, on_failure=discard_spool)
+def import_job(context: jobs.JobContext, path: str, format: str, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Job: import a spooled upload, then delete it"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as raw:
+            stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            return import_users(
+                read_rows(stream, format), batch_size=batch_size, max_errors=MAX_JOB_ERRORS,
+                progress=lambda created, failed: context.progress(
+                    100 * raw.tell() / size if size else 100, f"{created} created, {failed} failed"
+                ),
+            )
+    finally:
+        discard_spool(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV or NDJSON")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="input format (default: from file name)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if args.path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+    else:
+        stream = open(args.path, encoding="utf-8-sig", newline="")
+
+    # A one-off import can use every CPU
+    hasher = HashPool(os.cpu_count() or 1, settings.HASH_POOL_MAX_PENDING, settings.HASH_POOL_TIMEOUT_SECONDS)
+    try:
+        with stream:
+            result = import_users(read_rows(stream, fmt), batch_size=args.batch_size, hasher=hasher)
+    finally:
+        hasher.shutdown()
+
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['email'] or error['username'] or '-'}: {error['error']}")
+    if result["errors_truncated"]:
+        print(f"(first {MAX_REPORTED_ERRORS} errors shown)")
+    print(f"Imported {result['created']} users, {result['failed']} rows failed.")
+    if result["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,12 +12,156 @@ class Settings:
     DB_NAME: str = os.getenv("DB_NAME", "ai_career_toolkit")
 
     DB_URL: str = os.getenv("DATABASE_URL", "")
+
+    # Connection pooling
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "False").lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    # Connections each worker opens at startup (0 to skip the warm-up)
+    DB_WARM_UP_CONNECTIONS: int = int(os.getenv("DB_WARM_UP_CONNECTIONS", DB_POOL_SIZE))
+
+    # Read replicas: comma-separated URLs serving read-only routes (none = all on the primary)
+    DB_REPLICA_URLS: list = [
+        url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    # How often a replica is pinged, and how long one that failed is skipped
+    DB_REPLICA_CHECK_SECONDS: float = float(os.getenv("DB_REPLICA_CHECK_SECONDS", 5))
+    DB_REPLICA_RETRY_SECONDS: float = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+    # MySQL replicas further behind than this are skipped (0 disables the check)
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 0))
+    # After a client's own write, its reads go to the primary for this long (0 disables)
+    DB_READ_YOUR_WRITES_SECONDS: float = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "fallback-secret-key")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+    # Comma-separated emails allowed to use the /admin endpoints
+    ADMIN_EMAILS: list = [
+        email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+    ]
+
+    # Authentication caches (decoded tokens and user rows, per worker)
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+
+    # Serialized GET /profile/ responses (per worker; TTL bounds cross-worker staleness)
+    PROFILE_CACHE_MAX_ENTRIES: int = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", 10000))
+    PROFILE_CACHE_TTL_SECONDS: float = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", 10))
+
+    # Web server worker processes (run.py / gunicorn.conf.py)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+    # Password hashing pool, per web worker (0 workers hashes on the threadpool instead)
+    HASH_POOL_WORKERS: int = int(os.getenv("HASH_POOL_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+    HASH_POOL_MAX_PENDING: int = int(os.getenv("HASH_POOL_MAX_PENDING", 64))
+    HASH_POOL_TIMEOUT_SECONDS: float = float(os.getenv("HASH_POOL_TIMEOUT_SECONDS", 10))
+    # Separate pool for bulk imports, started on first use (0 hashes in the importing thread)
+    HASH_BULK_WORKERS: int = int(os.getenv("HASH_BULK_WORKERS", 1))
+    # bcrypt cost; set it with `python hashing.py --calibrate`, which picks the
+    # highest cost whose verify fits BCRYPT_BUDGET_MS on this host. Hashes at
+    # another cost are rehashed as their users log in.
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    BCRYPT_BUDGET_MS: float = float(os.getenv("BCRYPT_BUDGET_MS", 250))
+
+    # Admission control for login/register: token buckets per client IP and per
+    # login identifier (per worker).
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_IP_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", 30))
+    RATE_LIMIT_IP_BURST: int = int(os.getenv("RATE_LIMIT_IP_BURST", 10))
+    RATE_LIMIT_LOGIN_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_LOGIN_PER_MINUTE", 5))
+    RATE_LIMIT_LOGIN_BURST: int = int(os.getenv("RATE_LIMIT_LOGIN_BURST", 5))
+    # Separate per-IP bucket for /auth/available (checked as the user types)
+    RATE_LIMIT_AVAILABILITY_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_AVAILABILITY_PER_MINUTE", 120))
+    RATE_LIMIT_AVAILABILITY_BURST: int = int(os.getenv("RATE_LIMIT_AVAILABILITY_BURST", 30))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+    # Proxies whose X-Forwarded-For is believed: comma-separated addresses or
+    # CIDR ranges, or * for any peer (only when the app can't be reached except
+    # through the proxy, as on Railway, Render or Heroku). Behind a proxy that
+    # isn't listed, every client shares the proxy's address and so one IP rate
+    # limit bucket. Same name and format as uvicorn's and gunicorn's setting.
+    # The old RATE_LIMIT_TRUST_FORWARDED=True means *.
+    FORWARDED_ALLOW_IPS: list = [
+        entry.strip() for entry in os.getenv(
+            "FORWARDED_ALLOW_IPS",
+            "*" if os.getenv("RATE_LIMIT_TRUST_FORWARDED", "False").lower() == "true" else "",
+        ).split(",") if entry.strip()
+    ]
+
+    # Requests slower than this are logged with their DB and hashing breakdown
+    SLOW_REQUEST_SECONDS: float = float(os.getenv("SLOW_REQUEST_SECONDS", 1.0))
+
+    # Readiness probe (/health/ready): not ready when the DB ping fails or takes
+    # longer than the timeout, or when this share of the pool (connections in
+    # use plus callers waiting, over pool_size + max_overflow) is taken
+    HEALTH_PING_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_PING_TIMEOUT_SECONDS", 2))
+    HEALTH_POOL_SATURATION: float = float(os.getenv("HEALTH_POOL_SATURATION", 0.9))
     
+    # Resume uploads
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", 64 * 1024))
+    RESUME_MAX_BYTES: int = int(os.getenv("RESUME_MAX_BYTES", 10 * 1024 * 1024))
+    RESUME_PARSE_WORKERS: int = int(os.getenv(
+        "RESUME_PARSE_WORKERS", max(1, (os.cpu_count() or 2) // 2 // WEB_CONCURRENCY)
+    ))
+
+    # ATS scoring keyword sets
+    ATS_KEYWORDS_PATH: str = os.getenv(
+        "ATS_KEYWORDS_PATH", os.path.join(os.path.dirname(__file__), "data", "ats_keywords.json")
+    )
+
+    # Career roadmap skill graph and cached plans (per worker)
+    SKILL_GRAPH_PATH: str = os.getenv(
+        "SKILL_GRAPH_PATH", os.path.join(os.path.dirname(__file__), "data", "skill_graph.json")
+    )
+    ROADMAP_CACHE_SIZE: int = int(os.getenv("ROADMAP_CACHE_SIZE", 4096))
+
+    # Username/email availability filter (per worker)
+    AVAILABILITY_ERROR_RATE: float = float(os.getenv("AVAILABILITY_ERROR_RATE", 0.01))
+    AVAILABILITY_SYNC_SECONDS: float = float(os.getenv("AVAILABILITY_SYNC_SECONDS", 5))
+
+    # Skill index: how often each worker picks up profiles updated elsewhere
+    SKILL_INDEX_SYNC_SECONDS: float = float(os.getenv("SKILL_INDEX_SYNC_SECONDS", 30))
+
+    # Full-text search: shortest word MySQL indexes (innodb_ft_min_token_size)
+    SEARCH_MIN_TOKEN_SIZE: int = int(os.getenv("SEARCH_MIN_TOKEN_SIZE", 3))
+
+    # Activity log (batched background inserts, overflow spilled to disk)
+    ACTIVITY_LOG_ENABLED: bool = os.getenv("ACTIVITY_LOG_ENABLED", "True").lower() == "true"
+    ACTIVITY_BATCH_SIZE: int = int(os.getenv("ACTIVITY_BATCH_SIZE", 500))
+    ACTIVITY_FLUSH_SECONDS: float = float(os.getenv("ACTIVITY_FLUSH_SECONDS", 1))
+    ACTIVITY_QUEUE_MAX: int = int(os.getenv("ACTIVITY_QUEUE_MAX", 10000))
+    ACTIVITY_SPILL_DIR: str = os.getenv("ACTIVITY_SPILL_DIR", "activity_spill")
+    ACTIVITY_SPILL_MAX_BYTES: int = int(os.getenv("ACTIVITY_SPILL_MAX_BYTES", 64 * 1024 * 1024))
+    ACTIVITY_REPLAY_SECONDS: float = float(os.getenv("ACTIVITY_REPLAY_SECONDS", 30))
+
+    # Background jobs: worker threads per app process (0 to run them only in
+    # `python jobs.py --work`), process pool size for CPU-bound handlers
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 2))
+    JOB_PROCESSES: int = int(os.getenv("JOB_PROCESSES", 1))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", 60))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", 2))
+    JOB_CLAIM_CANDIDATES: int = int(os.getenv("JOB_CLAIM_CANDIDATES", 5))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_BASE_SECONDS: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", 10))
+    JOB_RETRY_MAX_SECONDS: float = float(os.getenv("JOB_RETRY_MAX_SECONDS", 900))
+    JOB_STREAM_INTERVAL_SECONDS: float = float(os.getenv("JOB_STREAM_INTERVAL_SECONDS", 1))
+
+    # Interview question bank (source file and its compiled, memory-mapped form)
+    INTERVIEW_QUESTIONS_PATH: str = os.getenv(
+        "INTERVIEW_QUESTIONS_PATH", os.path.join(os.path.dirname(__file__), "data", "interview_questions.json")
+    )
+    INTERVIEW_BANK_PATH: str = os.getenv(
+        "INTERVIEW_BANK_PATH", os.path.join(os.path.dirname(__file__), "data", "interview_questions.bin")
+    )
+    # How often workers check whether the compiled bank was replaced
+    INTERVIEW_BANK_CHECK_SECONDS: float = float(os.getenv("INTERVIEW_BANK_CHECK_SECONDS", 1))
+
     # App
     APP_NAME: str = os.getenv("APP_NAME", "AI Career Toolkit")
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
@@ -34,4 +178,20 @@ class Settings:
         else:
             return f"mysql+pymysql://{self.DB_USER}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @staticmethod
+    def async_url(url: str) -> str:
+        # Same database, reached through the asyncio drivers
+        for prefix, async_prefix in (
+            ("mysql+pymysql://", "mysql+aiomysql://"),
+            ("mysql://", "mysql+aiomysql://"),
+            ("sqlite://", "sqlite+aiosqlite://"),
+        ):
+            if url.startswith(prefix):
+                return async_prefix + url[len(prefix):]
+        return url
+
+    @property
+    def async_database_url(self) -> str:
+        return self.async_url(self.database_url)
+
 settings = Settings()
\ No newline at end of file
@@ -1,12 +1,322 @@
-from sqlalchemy import create_engine
+import contextvars
+import hashlib
+import hmac
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
 from config import settings
 
-engine = create_engine(settings.database_url)
+logger = logging.getLogger(__name__)
+
+
+class _WaitTracking:
+    """Pool mixin counting callers waiting for a connection, for the readiness probe"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._wait_lock = threading.Lock()
+
+    def _do_get(self):
+        with self._wait_lock:
+            self.waiting += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._wait_lock:
+                self.waiting -= 1
+                # Checkouts from a non-empty pool take microseconds; count the rest
+                if elapsed >= 0.001:
+                    self.waits += 1
+                    self.wait_seconds += elapsed
+
+
+class WaitTrackingQueuePool(_WaitTracking, QueuePool):
+    pass
+
+
+class WaitTrackingAsyncQueuePool(_WaitTracking, AsyncAdaptedQueuePool):
+    pass
+
+
+# Pools log under their class's module; keep these as quiet as the stock
+# sqlalchemy.pool loggers instead of logging every dispose at INFO
+for _pool_class in (WaitTrackingQueuePool, WaitTrackingAsyncQueuePool):
+    logging.getLogger(f"{_pool_class.__module__}.{_pool_class.__name__}").setLevel(logging.WARNING)
+
+
+def engine_options(url: str) -> dict:
+    """Connection pool options from settings for the given database URL"""
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    # SQLite uses file/singleton pools that don't take sizing arguments
+    if not url.startswith("sqlite"):
+        is_async = make_url(url).get_dialect().is_async
+        options.update(
+            poolclass=WaitTrackingAsyncQueuePool if is_async else WaitTrackingQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Optional async engine (aiomysql/aiosqlite), enabled with DB_ASYNC=true
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    async_engine = create_async_engine(
+        settings.async_database_url, **engine_options(settings.async_database_url)
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
+
+# Read replicas
+#
+# Read-only routes take get_read_session, whose sessions bind to a healthy
+# replica (round robin) on first use, or to the primary when there are no
+# replicas, none is healthy, or the client wrote within the last
+# DB_READ_YOUR_WRITES_SECONDS. The client carries its last write time: when a
+# session that flushed or executed DML commits during a request, the response
+# gets a last-write token (HMAC-signed with SECRET_KEY) as the last_write
+# cookie and the X-Last-Write header, and requests sending either one back
+# read from the primary until the window passes, whichever worker or host
+# serves them.
+
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "x-last-write"
+
+# Per request: {"primary": the client wrote recently, "wrote": this request committed a write}
+_request_writes: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_writes", default=None)
+
+
+def _sign(value: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"last-write:{value}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def last_write_token(written_at: float) -> str:
+    """Signed token for a write at written_at (epoch seconds)"""
+    value = str(int(written_at * 1000))
+    return f"{value}.{_sign(value)}"
+
+
+def wrote_recently(token: Optional[str]) -> bool:
+    """Whether a last-write token is authentic and within the read-your-writes window"""
+    value, _, signature = (token or "").partition(".")
+    if not value.isdigit() or not hmac.compare_digest(signature, _sign(value)):
+        return False
+    return abs(time.time() - int(value) / 1000) < settings.DB_READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware reading and issuing last-write tokens for replica routing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        window = settings.DB_READ_YOUR_WRITES_SECONDS
+        if scope["type"] != "http" or window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        token = headers.get(LAST_WRITE_HEADER) or cookie_parser(headers.get("cookie", "")).get(LAST_WRITE_COOKIE)
+        state = {"primary": wrote_recently(token), "wrote": False}
+        reset = _request_writes.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                token = last_write_token(time.time())
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append(LAST_WRITE_HEADER, token)
+                response_headers.append(
+                    "set-cookie",
+                    f"{LAST_WRITE_COOKIE}={token}; Max-Age={math.ceil(window)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_writes.reset(reset)
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    # The state dict is shared with threadpool copies of the request context
+    state = _request_writes.get()
+    if session.info.pop("wrote", False) and state is not None:
+        state["wrote"] = True
+
+
+class ReplicaSet:
+    """Replica engines with health checks, falling back to the primary"""
+
+    def __init__(self, primary: Engine, replicas: List[Engine]):
+        self.primary = primary
+        self.replicas = replicas
+        self._checked_at = [0.0] * len(replicas)
+        self._down_until = [0.0] * len(replicas)
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        for index, replica in enumerate(replicas):
+            event.listen(replica, "handle_error", self._error_listener(index))
+
+    def _error_listener(self, index: int):
+        def on_error(context):
+            # A lost or refused connection takes the replica out of rotation
+            # right away instead of at the next health check
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(index)
+        return on_error
+
+    def mark_down(self, index: int):
+        now = time.monotonic()
+        with self._lock:
+            was_up = now >= self._down_until[index]
+            self._down_until[index] = now + settings.DB_REPLICA_RETRY_SECONDS
+        if was_up:
+            logger.warning("Read replica %s is unavailable; using other replicas or the primary", index)
+
+    def _lag(self, conn) -> Optional[float]:
+        row = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+        return row["Seconds_Behind_Source"] if row else None
+
+    def _check(self, index: int) -> bool:
+        replica = self.replicas[index]
+        try:
+            with replica.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+                if settings.DB_REPLICA_MAX_LAG_SECONDS > 0 and replica.dialect.name == "mysql":
+                    lag = self._lag(conn)
+                    if lag is None or lag > settings.DB_REPLICA_MAX_LAG_SECONDS:
+                        logger.warning("Read replica %s is lagging (%s s behind)", index, lag)
+                        return False
+        except Exception:
+            return False
+        return True
+
+    def healthy(self, index: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._down_until[index]:
+                return False
+            due = now - self._checked_at[index] >= settings.DB_REPLICA_CHECK_SECONDS
+            if due:
+                self._checked_at[index] = now
+        if due and not self._check(index):
+            self.mark_down(index)
+            return False
+        return True
+
+    def route(self) -> Engine:
+        """Engine for a read: a healthy replica unless the client needs the primary"""
+        state = _request_writes.get()
+        if not self.replicas or (state is not None and (state["primary"] or state["wrote"])):
+            return self.primary
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            index = (start + offset) % len(self.replicas)
+            if self.healthy(index):
+                return self.replicas[index]
+        return self.primary
+
+    def status(self) -> List[dict]:
+        now = time.monotonic()
+        return [
+            {"replica": index, "healthy": now >= self._down_until[index]}
+            for index in range(len(self.replicas))
+        ]
+
+
+class ReadSession(Session):
+    """Session for read-only routes, bound by info["replicas"] on first use"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        bind = self.info.get("bind")
+        if bind is None:
+            bind = self.info["bind"] = self.info["replicas"].route()
+        return bind
+
+
+@event.listens_for(ReadSession, "before_flush")
+def _read_only(session, flush_context, instances):
+    raise RuntimeError("Read sessions are read-only; use get_session for writes")
+
+
+replica_engines = [create_engine(url, **engine_options(url)) for url in settings.DB_REPLICA_URLS]
+replicas = ReplicaSet(engine, replica_engines)
+ReadSessionLocal = sessionmaker(
+    class_=ReadSession, autocommit=False, autoflush=False, info={"replicas": replicas}
+)
+
+async_replica_engines = []
+AsyncReadSessionLocal = None
+if async_engine is not None:
+    async_replica_engines = [
+        create_async_engine(settings.async_url(url), **engine_options(settings.async_url(url)))
+        for url in settings.DB_REPLICA_URLS
+    ]
+    # The async session runs the sync ReadSession underneath, which picks
+    # among the async engines' sync facades
+    async_replicas = ReplicaSet(async_engine.sync_engine, [e.sync_engine for e in async_replica_engines])
+    AsyncReadSessionLocal = async_sessionmaker(
+        sync_session_class=ReadSession, autoflush=False, expire_on_commit=False,
+        info={"replicas": async_replicas},
+    )
+
+
+def reset_pools():
+    """Drop pooled connections inherited from a parent process.
+
+    Called in each worker after fork: the parent's sockets must not be shared,
+    and close=False leaves them open for the parent instead of closing them
+    from the child.
+    """
+    engine.dispose(close=False)
+    for replica in replica_engines:
+        replica.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+        for replica in async_replica_engines:
+            replica.sync_engine.dispose(close=False)
+
 
 # Dependency to get database session
 def get_db():
@@ -14,4 +324,46 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Session dependency used by the async route handlers
+get_session = get_async_db if settings.DB_ASYNC else get_db
+
+
+# Read-only session dependencies (replica routed)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+# Without replicas, reads use the same sessions as everything else
+if not settings.DB_REPLICA_URLS:
+    get_read_session = get_session
+else:
+    get_read_session = get_async_read_db if settings.DB_ASYNC else get_read_db
+
+
+async def run_db(db, fn, *args):
+    """Run fn(session, *args) without blocking the event loop.
+
+    Query code is written once against a sync Session: on an AsyncSession it
+    runs through run_sync on the async driver, otherwise on the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
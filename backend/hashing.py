@@ -0,0 +1,279 @@
+"""
+Password hashing pool.
+
+bcrypt is CPU-bound and holds the GIL for the whole hash, so running it inline
+in request handlers pins AnyIO worker threads. This module runs hashing and
+verification in a bounded process pool instead, with a limit on how many
+operations may be queued and a timeout per operation. Bulk imports hash in a
+separate pool (bulk_hash_pool) so they can't starve interactive logins.
+
+The bcrypt cost is BCRYPT_ROUNDS, which `python hashing.py --calibrate`
+picks for this host from a per-verify latency budget. Hashes made at any
+other cost are rehashed at login (verify_and_update), so changing it moves
+users over gradually without a bulk migration.
+
+Usage:
+    python hashing.py --calibrate
+    python hashing.py --calibrate --budget-ms 150 --write .env
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from config import settings
+import metrics
+
+# Password hashing; min and max pin the cost so hashes at any other cost need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# Passwords per task submitted by hash_many
+BULK_CHUNK_SIZE = 64
+
+# bcrypt's own limits are 4..31; below 10 is too cheap to be worth it
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class HashPoolBusy(Exception):
+    """Raised when too many hash operations are already queued"""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _hash_batch(passwords: list) -> Tuple[list, list]:
+    """Hashes for a chunk of passwords, with the seconds each one took"""
+    hashes, timings = [], []
+    for password in passwords:
+        started = time.perf_counter()
+        hashes.append(pwd_context.hash(password))
+        timings.append(time.perf_counter() - started)
+    return hashes, timings
+
+
+def _warm_up() -> bool:
+    # Importing passlib's bcrypt backend is the slow part of a cold worker
+    pwd_context.handler("bcrypt").get_backend()
+    return True
+
+
+class HashPool:
+    """Runs password hashing in worker processes with bounded queueing"""
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker processes (no-op when workers is 0)"""
+        with self._lock:
+            if self.workers <= 0 or self._executor is not None:
+                return
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            # Spawn every worker now so the first logins don't pay for it
+            for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+                future.result()
+            self._executor = executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool, failing fast when the queue is full"""
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            raise HashPoolBusy()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            if self.workers <= 0:
+                task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+                task.add_done_callback(self._release)
+                # Shielded so a timeout leaves the thread to finish and release its slot
+                call = asyncio.shield(task)
+            else:
+                if self._executor is None:
+                    self.start()
+                future = self._executor.submit(fn, *args)
+                # The slot is held until the worker process is done with it, not
+                # just until we stop waiting: a timed-out hash keeps its CPU
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+                call = asyncio.wrap_future(future)
+        except BaseException:
+            self.pending -= 1
+            raise
+        return await asyncio.wait_for(call, timeout=self.timeout)
+
+    def _release(self, *_):
+        self.pending -= 1
+
+    def hash_many(self, passwords: list) -> list:
+        """Hash a batch of passwords across all workers (blocking).
+
+        At most two chunks per worker are submitted at a time, and each has
+        the pool timeout per password in it.
+        """
+        if self.workers <= 0:
+            return self._collect(passwords, _hash_batch(passwords))
+        if self._executor is None:
+            self.start()
+        chunksize = max(1, min(BULK_CHUNK_SIZE, len(passwords) // (self.workers * 4)))
+        chunks = [passwords[start:start + chunksize] for start in range(0, len(passwords), chunksize)]
+        hashes, in_flight = [], deque()
+        for chunk in chunks:
+            if len(in_flight) >= 2 * self.workers:
+                hashes.extend(self._wait(*in_flight.popleft()))
+            in_flight.append((chunk, self._executor.submit(_hash_batch, chunk)))
+        while in_flight:
+            hashes.extend(self._wait(*in_flight.popleft()))
+        return hashes
+
+    def _wait(self, chunk: list, future) -> list:
+        return self._collect(chunk, future.result(timeout=self.timeout * len(chunk)))
+
+    def _collect(self, chunk: list, result: Tuple[list, list]) -> list:
+        hashes, timings = result
+        for seconds in timings:
+            metrics.record_hash("bulk_hash", seconds)
+        return hashes
+
+    async def hash(self, password: str) -> str:
+        started = time.perf_counter()
+        try:
+            return await self.run(_hash, password)
+        finally:
+            metrics.record_hash("hash", time.perf_counter() - started)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        started = time.perf_counter()
+        try:
+            return await self.run(_verify, plain_password, hashed_password)
+        finally:
+            metrics.record_hash("verify", time.perf_counter() - started)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, plus a new hash at the configured cost if the stored one uses another"""
+        started = time.perf_counter()
+        try:
+            return await self.run(_verify_and_update, plain_password, hashed_password)
+        finally:
+            metrics.record_hash("verify", time.perf_counter() - started)
+
+
+def benchmark(rounds: int, samples: int = 5) -> float:
+    """Median seconds to verify a password against a hash of the given cost"""
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds)
+    hashed = handler.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.verify("calibration-password", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def calibrate(budget: float, samples: int = 5) -> Tuple[int, dict]:
+    """Highest cost whose verify fits the budget (at least MIN_ROUNDS), with the timings measured"""
+    _warm_up()
+    timings = {}
+    chosen = MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        # Each extra round doubles the work, so stop at the first one over budget
+        timings[rounds] = benchmark(rounds, samples if rounds < 14 else 3)
+        if timings[rounds] > budget:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+def write_setting(path: str, name: str, value) -> None:
+    """Set name=value in an env file, replacing an existing assignment"""
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = f.read().splitlines()
+    pattern = re.compile(rf"^\s*{re.escape(name)}\s*=")
+    line = f"{name}={value}"
+    for index, existing in enumerate(lines):
+        if pattern.match(existing):
+            lines[index] = line
+            break
+    else:
+        lines.append(line)
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing tools")
+    parser.add_argument("--calibrate", action="store_true", help="benchmark bcrypt and pick BCRYPT_ROUNDS")
+    parser.add_argument("--budget-ms", type=float, default=settings.BCRYPT_BUDGET_MS,
+                        help="target time for one password verify (default: BCRYPT_BUDGET_MS)")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--write", metavar="ENV_FILE", help="store the result in this env file")
+    args = parser.parse_args()
+    if not args.calibrate:
+        parser.error("nothing to do (pass --calibrate)")
+
+    rounds, timings = calibrate(args.budget_ms / 1000, args.samples)
+    for cost, seconds in timings.items():
+        print(f"rounds={cost:2d}  {seconds * 1000:8.1f} ms" + ("  <-" if cost == rounds else ""))
+    if timings[rounds] > args.budget_ms / 1000:
+        print(f"Even rounds={MIN_ROUNDS} is over the {args.budget_ms:.0f} ms budget on this host; using it anyway.")
+    if args.write:
+        write_setting(args.write, "BCRYPT_ROUNDS", rounds)
+        print(f"Wrote BCRYPT_ROUNDS={rounds} to {args.write} (currently {settings.BCRYPT_ROUNDS}).")
+    else:
+        print(f"BCRYPT_ROUNDS={rounds} (currently {settings.BCRYPT_ROUNDS})")
+
+
+hash_pool = HashPool(
+    workers=settings.HASH_POOL_WORKERS,
+    max_pending=settings.HASH_POOL_MAX_PENDING,
+    timeout=settings.HASH_POOL_TIMEOUT_SECONDS,
+)
+
+# Bulk imports only; hash_many bounds its own queue, so max_pending is unused
+bulk_hash_pool = HashPool(
+    workers=settings.HASH_BULK_WORKERS,
+    max_pending=settings.HASH_POOL_MAX_PENDING,
+    timeout=settings.HASH_POOL_TIMEOUT_SECONDS,
+)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Liveness and readiness checks, and the startup warm-up.
+
+/health/live only says the process is serving. /health/ready tells the load
+balancer whether this worker should get traffic: it is not ready when the
+primary database doesn't answer a ping within HEALTH_PING_TIMEOUT_SECONDS,
+or when its connection pool is saturated (in use plus waiting callers at
+HEALTH_POOL_SATURATION of pool_size + max_overflow), since requests would
+then queue for DB_POOL_TIMEOUT. A saturated pool isn't pinged, so the probe
+itself never waits for a connection. A ping that times out can't be
+interrupted, so it is left to finish and probes arriving meanwhile wait on
+it instead of starting another: at most one ping thread and connection per
+engine are ever tied up by a hung database. Replicas are reported but don't
+affect readiness: reads fall back to the primary without them.
+
+The warm-up runs in the lifespan, before the server accepts requests. It
+opens DB_WARM_UP_CONNECTIONS pooled connections per engine and configures
+the ORM mappers, so the first requests on a new or recycled worker don't
+pay for connection setup or mapper configuration.
+"""
+import asyncio
+import logging
+import time
+from typing import Tuple
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import engine, async_engine, replica_engines, async_replica_engines, replicas
+import models  # noqa: F401 (mappers to configure)
+
+logger = logging.getLogger(__name__)
+
+# Engine -> its latest ping, shared by probes until it finishes
+_pings = {}
+
+
+def pool_stats(db_engine: Engine) -> dict:
+    """Checked-out, overflow and waiting counts for an engine's pool"""
+    pool = db_engine.pool
+    if not isinstance(pool, QueuePool):
+        # SQLite's singleton/static pools have no limit to saturate
+        return {"pool": type(pool).__name__}
+    waiting = getattr(pool, "waiting", 0)
+    capacity = pool.size() + max(0, pool._max_overflow)
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "waiting": waiting,
+        "waits": getattr(pool, "waits", 0),
+        "wait_seconds": round(getattr(pool, "wait_seconds", 0.0), 3),
+        "saturation": round((pool.checkedout() + waiting) / capacity, 3) if capacity else 0.0,
+    }
+
+
+def _ping(db_engine: Engine):
+    with db_engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+
+async def _ping_async(db_engine):
+    async with db_engine.connect() as conn:
+        await conn.exec_driver_sql("SELECT 1")
+
+
+def _start_ping(db_engine, is_async: bool) -> asyncio.Future:
+    ping = _pings.get(db_engine)
+    if ping is None or ping.done():
+        ping = asyncio.ensure_future(_ping_async(db_engine) if is_async else run_in_threadpool(_ping, db_engine))
+        # Its error is reported by the probe awaiting it, or not at all if that timed out
+        ping.add_done_callback(lambda future: future.cancelled() or future.exception())
+        _pings[db_engine] = ping
+    return ping
+
+
+async def check_database(db_engine, is_async: bool = False) -> dict:
+    """Ping the database unless its pool is already saturated"""
+    stats = pool_stats(db_engine.sync_engine if is_async else db_engine)
+    result = {"ok": False, **stats}
+    if stats.get("saturation", 0.0) >= settings.HEALTH_POOL_SATURATION:
+        result["error"] = "connection pool saturated"
+        return result
+    started = time.perf_counter()
+    try:
+        # Shielded: a timeout leaves the ping running for the next probe to wait on
+        await asyncio.wait_for(asyncio.shield(_start_ping(db_engine, is_async)),
+                               timeout=settings.HEALTH_PING_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        result["error"] = "ping timed out"
+        return result
+    except Exception as e:
+        result["error"] = type(e).__name__
+        return result
+    result["ok"] = True
+    result["ping_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def readiness() -> Tuple[bool, dict]:
+    """Whether this worker should take traffic, with the details"""
+    checks = {"database": await check_database(engine)}
+    if async_engine is not None:
+        checks["database_async"] = await check_database(async_engine, is_async=True)
+    ready = all(check["ok"] for check in checks.values())
+    if replica_engines:
+        checks["replicas"] = [
+            {**status, **pool_stats(replica)} for status, replica in zip(replicas.status(), replica_engines)
+        ]
+    return ready, {"status": "ready" if ready else "not ready", "checks": checks}
+
+
+def _open_connections(db_engine: Engine, count: int):
+    # Hold them all at once so the pool has to create each one
+    connections = []
+    try:
+        for _ in range(count):
+            conn = db_engine.connect()
+            connections.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+async def _open_connections_async(db_engine, count: int):
+    connections = []
+    try:
+        for _ in range(count):
+            conn = await db_engine.connect()
+            connections.append(conn)
+            await conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in connections:
+            await conn.close()
+
+
+async def warm_up():
+    """Configure the ORM and fill the connection pools; a database error is logged, not raised"""
+    count = settings.DB_WARM_UP_CONNECTIONS
+    started = time.perf_counter()
+    configure_mappers()
+    engines = [(db_engine, False) for db_engine in [engine, *replica_engines]]
+    if async_engine is not None:
+        engines += [(db_engine, True) for db_engine in [async_engine, *async_replica_engines]]
+    for db_engine, is_async in engines:
+        try:
+            if is_async:
+                await _open_connections_async(db_engine, count)
+            else:
+                await run_in_threadpool(_open_connections, db_engine, count)
+        except Exception as e:
+            # Still start: readiness reports the database until it comes back
+            logger.warning("Could not warm up connections to %s: %s", db_engine.url.host or db_engine.url.database, e)
+    logger.info("Warmed up %d connections per engine in %.2fs", count, time.perf_counter() - started)
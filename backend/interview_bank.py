@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Interview question bank.
+
+Questions are authored in data/interview_questions.json (or YAML) and
+compiled into one binary file: a JSON header followed by flat arrays of
+question ids, role/difficulty codes, tags (CSR offsets + tag codes) and the
+UTF-8 question text. Workers memory-map the compiled file, so loading it is
+cheap, its pages are shared between worker processes, and a recompiled file
+is picked up by every worker without a restart. The file is compiled once
+per deploy, before any worker starts (migrations.prepare() and
+migrate_database.py); workers only map it.
+
+Per-user sampling walks a keyed pseudo-random permutation (a small Feistel
+network) of the questions matching a filter. A user sees a question again
+only after every matching question has been served, drawing k questions is
+O(k), and the state kept per user and filter is one counter of questions
+drawn, stored in interview_progress and advanced with an atomic UPDATE, so
+every worker and restart continues the same pass and concurrent requests
+claim disjoint ranges of it.
+
+Usage:
+    python interview_bank.py --compile   # compile the source file to INTERVIEW_BANK_PATH
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import logging
+import tempfile
+import threading
+import time
+import zlib
+from typing import List, Optional
+import numpy as np
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config import settings
+import models
+
+try:
+    import yaml
+except ImportError:  # optional; JSON sources work without it
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"IQB1"
+_HEADER_LENGTH = struct.Struct("<I")
+_ALIGN = 8
+
+
+class BankError(Exception):
+    """Raised for an invalid question source or compiled bank file"""
+
+
+# Compiling
+
+def load_source(path: Optional[str] = None) -> dict:
+    """Parse the question source file (JSON, or YAML when PyYAML is installed)"""
+    path = path or settings.INTERVIEW_QUESTIONS_PATH
+    with open(path, "rb") as f:
+        raw = f.read()
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise BankError("PyYAML is required for YAML question banks")
+        data = yaml.safe_load(raw)
+    else:
+        data = json.loads(raw)
+    data["checksum"] = hashlib.sha256(raw).hexdigest()[:16]
+    return data
+
+
+def compile_bank(source: Optional[str] = None, target: Optional[str] = None) -> int:
+    """Compile the question source into the memory-mappable bank file; returns the question count"""
+    data = load_source(source)
+    target = target or settings.INTERVIEW_BANK_PATH
+    questions = data.get("questions") or []
+    difficulties = list(data.get("difficulties") or sorted({q["difficulty"] for q in questions}))
+
+    seen = set()
+    for q in questions:
+        if not isinstance(q.get("id"), int) or q["id"] in seen:
+            raise BankError(f"Question ids must be unique integers (got {q.get('id')!r})")
+        if q.get("difficulty") not in difficulties:
+            raise BankError(f"Question {q['id']} has unknown difficulty {q.get('difficulty')!r}")
+        if not q.get("role") or not q.get("text"):
+            raise BankError(f"Question {q['id']} needs a role and text")
+        seen.add(q["id"])
+
+    roles = sorted({q["role"] for q in questions})
+    tags = sorted({tag.lower() for q in questions for tag in q.get("tags", [])})
+    role_codes = {role: i for i, role in enumerate(roles)}
+    tag_codes = {tag: i for i, tag in enumerate(tags)}
+    difficulty_codes = {name: i for i, name in enumerate(difficulties)}
+
+    texts = [q["text"].encode("utf-8") for q in questions]
+    question_tags = [sorted({tag_codes[tag.lower()] for tag in q.get("tags", [])}) for q in questions]
+    arrays = {
+        "ids": np.array([q["id"] for q in questions], dtype=np.int64),
+        "roles": np.array([role_codes[q["role"]] for q in questions], dtype=np.uint16),
+        "difficulties": np.array([difficulty_codes[q["difficulty"]] for q in questions], dtype=np.uint8),
+        "tag_offsets": np.cumsum([0] + [len(t) for t in question_tags], dtype=np.uint32),
+        "tags": np.array([code for t in question_tags for code in t], dtype=np.uint16),
+        "text_offsets": np.cumsum([0] + [len(t) for t in texts], dtype=np.uint64),
+        "text": np.frombuffer(b"".join(texts), dtype=np.uint8),
+    }
+    # Ids sorted, with the positions they came from, for id lookups by binary search
+    order = np.argsort(arrays["ids"], kind="stable")
+    arrays["sorted_ids"] = arrays["ids"][order]
+    arrays["sorted_positions"] = order.astype(np.uint32)
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, offset, int(array.size)]
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({
+        "checksum": data["checksum"],
+        "roles": roles,
+        "tags": tags,
+        "difficulties": difficulties,
+        "arrays": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + _HEADER_LENGTH.size + len(header)) % _ALIGN)
+
+    # Write next to the target and swap it in, so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(target))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".interview-bank-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+            for array in arrays.values():
+                f.write(array.tobytes())
+                f.write(b"\0" * (-array.nbytes % _ALIGN))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(questions)
+
+
+# Loading
+
+class QuestionBank:
+    """A memory-mapped compiled question bank"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise BankError(f"{path} is not a compiled question bank")
+        (length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(self._mmap[start:start + length])
+        base = start + length
+
+        self.checksum: str = header["checksum"]
+        self.roles: List[str] = header["roles"]
+        self.tags: List[str] = header["tags"]
+        self.difficulties: List[str] = header["difficulties"]
+        # Zero-copy views into the mapping
+        for name, (dtype, offset, count) in header["arrays"].items():
+            setattr(self, "_" + name, np.frombuffer(self._mmap, dtype=dtype, count=count, offset=base + offset))
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._ids.size)
+
+    def position(self, question_id: int) -> Optional[int]:
+        """Position of a question id in the bank, or None"""
+        i = int(np.searchsorted(self._sorted_ids, question_id))
+        if i < self._sorted_ids.size and self._sorted_ids[i] == question_id:
+            return int(self._sorted_positions[i])
+        return None
+
+    def question(self, position: int) -> dict:
+        text_start, text_end = self._text_offsets[position], self._text_offsets[position + 1]
+        tag_start, tag_end = self._tag_offsets[position], self._tag_offsets[position + 1]
+        return {
+            "id": int(self._ids[position]),
+            "role": self.roles[self._roles[position]],
+            "difficulty": self.difficulties[self._difficulties[position]],
+            "tags": [self.tags[code] for code in self._tags[tag_start:tag_end]],
+            "text": self._text[text_start:text_end].tobytes().decode("utf-8"),
+        }
+
+    def pool(self, role: Optional[str] = None, difficulty: Optional[str] = None,
+             tag: Optional[str] = None) -> np.ndarray:
+        """Positions of the questions matching a filter (computed once per filter)"""
+        key = (role, difficulty, tag)
+        pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+        for value, known, kind in ((role, self.roles, "role"), (difficulty, self.difficulties, "difficulty"),
+                                   (tag, self.tags, "tag")):
+            if value is not None and value not in known:
+                raise BankError(f"Unknown {kind} {value!r}")
+        mask = np.ones(len(self), dtype=bool)
+        if role is not None:
+            mask &= self._roles == self.roles.index(role)
+        if difficulty is not None:
+            mask &= self._difficulties == self.difficulties.index(difficulty)
+        if tag is not None:
+            # Mark the questions owning each matching entry of the flat tag array
+            has_tag = np.zeros(len(self), dtype=bool)
+            entries = np.flatnonzero(self._tags == self.tags.index(tag))
+            has_tag[np.searchsorted(self._tag_offsets, entries, side="right") - 1] = True
+            mask &= has_tag
+        pool = np.flatnonzero(mask).astype(np.uint32)
+        with self._pools_lock:
+            self._pools[key] = pool
+        return pool
+
+    def summary(self) -> dict:
+        counts = np.bincount(self._roles, minlength=len(self.roles))
+        return {
+            "questions": len(self),
+            "roles": {role: int(count) for role, count in zip(self.roles, counts)},
+            "tags": self.tags,
+            "difficulties": self.difficulties,
+        }
+
+
+_bank: Optional[QuestionBank] = None
+_bank_stat = None
+_checked_at = 0.0
+_bank_lock = threading.Lock()
+
+
+def _stat(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _is_stale(source: str, target: str) -> bool:
+    return not os.path.exists(target) or os.stat(source).st_mtime_ns > os.stat(target).st_mtime_ns
+
+
+def compile_if_stale() -> Optional[int]:
+    """Compile the bank if the source is newer than the compiled file; returns the count if compiled"""
+    source, target = settings.INTERVIEW_QUESTIONS_PATH, settings.INTERVIEW_BANK_PATH
+    if _is_stale(source, target):
+        return compile_bank(source, target)
+    return None
+
+
+def start():
+    """Load the compiled bank in a worker; compiling is left to the deploy step"""
+    source, target = settings.INTERVIEW_QUESTIONS_PATH, settings.INTERVIEW_BANK_PATH
+    if not os.path.exists(target):
+        raise BankError(
+            f"{target} has not been compiled; run `python interview_bank.py --compile` "
+            "or `python migrate_database.py`"
+        )
+    if _is_stale(source, target):
+        logger.warning("%s is older than %s; serving it until it is recompiled", target, source)
+    reload()
+
+
+def reload() -> QuestionBank:
+    """Map the current compiled bank file"""
+    global _bank, _bank_stat, _checked_at
+    path = settings.INTERVIEW_BANK_PATH
+    with _bank_lock:
+        stat = _stat(path)
+        bank = QuestionBank(path)
+        # Older banks stay mapped until the last request using them is done
+        _bank, _bank_stat, _checked_at = bank, stat, time.monotonic()
+    return bank
+
+
+def get_bank() -> QuestionBank:
+    """The loaded bank, remapped when the compiled file has been replaced"""
+    global _checked_at
+    if _bank is None:
+        start()
+    elif time.monotonic() - _checked_at > settings.INTERVIEW_BANK_CHECK_SECONDS:
+        _checked_at = time.monotonic()
+        if _stat(settings.INTERVIEW_BANK_PATH) != _bank_stat:
+            reload()
+    return _bank
+
+
+# Sampling
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(x: int, key: int) -> int:
+    # splitmix64 finalizer: stable across processes, unlike hash()
+    x = ((x ^ key) * 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class Permutation:
+    """A keyed bijection on range(n), evaluated one index at a time"""
+
+    ROUNDS = 4
+
+    def __init__(self, n: int, seed: int):
+        self.n = n
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+        self.keys = [_mix(seed, round_) for round_ in range(self.ROUNDS)]
+
+    def __getitem__(self, i: int) -> int:
+        x = i
+        # A Feistel network permutes [0, 4^half_bits); walking the cycle until
+        # the value lands below n restricts it to a permutation of range(n)
+        while True:
+            left, right = x >> self.half_bits, x & self.mask
+            for key in self.keys:
+                left, right = right, left ^ (_mix(right, key) & self.mask)
+            x = (left << self.half_bits) | right
+            if x < self.n:
+                return x
+
+
+def _claim(db: Session, user_id: int, filter_key: str, checksum: str, count: int) -> int:
+    """Reserve the next count draws for a user and filter; returns the first one's number"""
+    progress = models.InterviewProgress.__table__
+    key = (progress.c.user_id == user_id) & (progress.c.filter_key == filter_key)
+    for attempt in range(2):
+        # A recompiled bank has a different order; start the filter over
+        db.execute(update(progress).where(key, progress.c.checksum != checksum).values(checksum=checksum, served=0))
+        if db.execute(update(progress).where(key).values(served=progress.c.served + count)).rowcount:
+            # Our own uncommitted update, so no other request can have moved it since
+            served = db.execute(select(progress.c.served).where(key)).scalar_one()
+            db.commit()
+            return served - count
+        try:
+            db.execute(insert(progress).values(user_id=user_id, filter_key=filter_key, checksum=checksum, served=count))
+            db.commit()
+            return 0
+        except IntegrityError:
+            # Another request created the row first; advance that one instead
+            db.rollback()
+            if attempt:
+                raise
+
+
+def sample(db: Session, user_id: int, count: int, role: Optional[str] = None,
+           difficulty: Optional[str] = None, tag: Optional[str] = None):
+    """Up to count questions the user hasn't been served since the filter's pool was exhausted.
+
+    Returns (questions, remaining), where remaining is how many unseen
+    questions are left in the current pass. Draw number d is position
+    d % n of pass d // n, each pass a new permutation of the pool.
+    """
+    bank = get_bank()
+    pool = bank.pool(role, difficulty, tag)
+    n = int(pool.size)
+    if n == 0:
+        return [], 0
+    filter_key = "|".join(value or "" for value in (role, difficulty, tag))
+    seed = _mix(user_id, zlib.crc32(repr((role, difficulty, tag, bank.checksum)).encode()))
+
+    chosen, permutations = [], {}
+    wanted = min(count, n)
+    while len(chosen) < wanted:
+        # Draws spanning two passes can repeat a question; claim more for those
+        need = wanted - len(chosen)
+        start = _claim(db, user_id, filter_key, bank.checksum, need)
+        for draw in range(start, start + need):
+            cycle, position = divmod(draw, n)
+            if cycle not in permutations:
+                permutations[cycle] = Permutation(n, seed + cycle)
+            index = permutations[cycle][position]
+            if index not in chosen:
+                chosen.append(index)
+    remaining = n - 1 - (start + need - 1) % n
+    return [bank.question(int(pool[index])) for index in chosen], remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interview question bank tools")
+    parser.add_argument("--compile", action="store_true", help="compile the question source file")
+    parser.add_argument("--source", help="question file (defaults to INTERVIEW_QUESTIONS_PATH)")
+    parser.add_argument("--target", help="compiled bank file (defaults to INTERVIEW_BANK_PATH)")
+    args = parser.parse_args()
+    if args.compile:
+        count = compile_bank(args.source, args.target)
+        print(f"Compiled {count} questions to {args.target or settings.INTERVIEW_BANK_PATH}.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
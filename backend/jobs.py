@@ -0,0 +1,386 @@
+"""
+Durable background jobs.
+
+Slow work (parsing uploads, rescoring every resume, ...) is enqueued as a row in the jobs
+table and run by a pool of worker threads started with the app, so it never
+holds a request. Any number of processes may run pools against the same
+table: a worker claims the highest-priority due job with a conditional
+UPDATE that takes a lease, and renews the lease while the handler runs. If
+the worker dies the lease expires and another worker picks the job up. A
+failed attempt is retried with exponential backoff until max_attempts.
+A handler can register an on_failure hook to clean up (e.g. delete an input
+file) once its job has failed for good, including when the worker running
+the last attempt died.
+
+Handlers are registered with @handler("kind") in the module that owns the
+work. They run in the worker thread and receive a JobContext for reporting
+progress, or with process=True run in a process pool (for CPU-bound work;
+they get only the payload). Clients poll GET /jobs/{id} or stream progress
+from GET /jobs/{id}/events.
+
+    python jobs.py --work    # run a standalone worker (e.g. with JOB_WORKERS=0 on the web tier)
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+from config import settings
+from database import engine
+import models, metrics
+
+logger = logging.getLogger(__name__)
+
+# Job.status values
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+JOBS = metrics.registry.register(metrics.Counter(
+    "jobs_total", "Job attempts by kind and outcome", ("kind", "outcome")))
+JOB_LATENCY = metrics.registry.register(metrics.Histogram(
+    "job_duration_seconds", "Job attempt run time", ("kind",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)))
+
+_jobs = models.Job.__table__
+
+
+class LeaseLost(Exception):
+    """Raised from JobContext when another worker has taken over the job"""
+
+
+class Handler:
+    def __init__(self, fn: Callable, process: bool, max_attempts: Optional[int],
+                 on_failure: Optional[Callable] = None):
+        self.fn = fn
+        self.process = process
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+
+
+_handlers: Dict[str, Handler] = {}
+
+
+def handler(kind: str, process: bool = False, max_attempts: Optional[int] = None,
+            on_failure: Optional[Callable] = None):
+    """Register fn(context, **payload) (or fn(**payload) with process=True) for a job kind
+
+    on_failure(**payload), if given, runs once the job has failed its last attempt.
+    """
+    def register(fn: Callable) -> Callable:
+        _handlers[kind] = Handler(fn, process, max_attempts, on_failure)
+        return fn
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(db: Session, kind: str, payload: Optional[dict] = None, priority: int = 0,
+            user_id: Optional[int] = None, max_attempts: Optional[int] = None, delay: float = 0.0) -> models.Job:
+    """Add a job and wake this process's workers"""
+    spec = _handlers.get(kind)
+    if spec is None:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    now = _now()
+    job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        status=QUEUED,
+        priority=priority,
+        max_attempts=max_attempts or spec.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=now + timedelta(seconds=delay),
+        user_id=user_id,
+        created_at=now,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    worker_pool.wake()
+    return job
+
+
+def describe(job) -> dict:
+    """API representation of a job row (a models.Job or a row mapping)"""
+    get = job.get if isinstance(job, dict) else lambda name: getattr(job, name)
+    return {
+        "id": get("id"),
+        "kind": get("kind"),
+        "status": get("status"),
+        "priority": get("priority"),
+        "attempts": get("attempts"),
+        "max_attempts": get("max_attempts"),
+        "progress": get("progress"),
+        "message": get("message"),
+        "result": json.loads(get("result")) if get("result") is not None else None,
+        "error": get("error"),
+        "run_at": get("run_at"),
+        "created_at": get("created_at"),
+        "started_at": get("started_at"),
+        "finished_at": get("finished_at"),
+    }
+
+
+def load(job_id: int) -> Optional[dict]:
+    """A job row as a dict, read on its own connection"""
+    with engine.connect() as conn:
+        row = conn.execute(select(_jobs).where(_jobs.c.id == job_id)).mappings().first()
+    return dict(row) if row else None
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retrying after the given number of failed attempts"""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    # Jitter so jobs that failed together don't retry together
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobContext:
+    """Passed to thread handlers for progress reporting"""
+
+    def __init__(self, pool: "WorkerPool", job_id: int, attempt: int):
+        self.pool = pool
+        self.job_id = job_id
+        self.attempt = attempt
+
+    def progress(self, percent: float, message: Optional[str] = None):
+        """Record progress (0-100); also renews the lease"""
+        now = _now()
+        with engine.begin() as conn:
+            result = conn.execute(
+                update(_jobs)
+                .where(_jobs.c.id == self.job_id, _jobs.c.status == RUNNING, _jobs.c.lease_owner == self.pool.owner)
+                .values(
+                    progress=max(0, min(100, int(percent))),
+                    message=message[:255] if message else None,
+                    lease_expires_at=now + timedelta(seconds=self.pool.lease_seconds),
+                )
+            )
+        if result.rowcount == 0:
+            raise LeaseLost(self.job_id)
+
+
+class WorkerPool:
+    """Threads that claim and run jobs, plus a heartbeat that renews their leases"""
+
+    def __init__(self, threads: int, processes: int, lease_seconds: float, poll_seconds: float):
+        self.threads = threads
+        self.processes = processes
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = ""
+        self._workers = []
+        self._running: Dict[int, str] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the worker threads (no-op when threads is 0)"""
+        with self._cond:
+            if self.threads <= 0 or self._workers:
+                return
+            # Set here rather than at import: gunicorn workers fork after import
+            self.owner = f"{socket.gethostname()}:{os.getpid()}"[:100]
+            self._stopping.clear()
+            self._workers = [
+                threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.threads)
+            ] + [threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)]
+            for thread in self._workers:
+                thread.start()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop claiming jobs and wait briefly for running ones.
+
+        Jobs still running afterwards are abandoned; their leases expire and
+        another worker retries them.
+        """
+        self._stopping.set()
+        with self._cond:
+            workers, self._workers = self._workers, []
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in workers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                with self._cond:
+                    self._cond.wait(self.poll_seconds)
+                continue
+            self._execute(job)
+
+    def _claim(self) -> Optional[dict]:
+        now = _now()
+        # Due queued jobs, and running jobs whose worker stopped renewing the lease
+        runnable = or_(
+            and_(_jobs.c.status == QUEUED, _jobs.c.run_at <= now),
+            and_(_jobs.c.status == RUNNING, _jobs.c.lease_expires_at < now),
+        )
+        with engine.begin() as conn:
+            candidates = conn.execute(
+                select(_jobs.c.id).where(runnable)
+                .order_by(_jobs.c.priority.desc(), _jobs.c.run_at, _jobs.c.id)
+                .limit(settings.JOB_CLAIM_CANDIDATES)
+            ).scalars().all()
+            for job_id in candidates:
+                # Only one worker's UPDATE can match while the job is still runnable
+                claimed = conn.execute(
+                    update(_jobs).where(_jobs.c.id == job_id, runnable).values(
+                        status=RUNNING,
+                        lease_owner=self.owner,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=_jobs.c.attempts + 1,
+                        started_at=now,
+                    )
+                ).rowcount
+                if claimed:
+                    return dict(conn.execute(select(_jobs).where(_jobs.c.id == job_id)).mappings().one())
+        return None
+
+    def _execute(self, job: dict):
+        job_id, kind = job["id"], job["kind"]
+        spec = _handlers.get(kind)
+        started = time.perf_counter()
+        self._running[job_id] = kind
+        try:
+            if spec is None:
+                raise LookupError(f"No handler registered for job kind {kind!r}")
+            if job["attempts"] > job["max_attempts"]:
+                # Claimed after the lease of its last attempt expired
+                self._fail(job, "Worker lost during the final attempt")
+                return
+            payload = json.loads(job["payload"] or "{}")
+            if spec.process:
+                result = self._process_pool().submit(spec.fn, **payload).result()
+            else:
+                result = spec.fn(JobContext(self, job_id, job["attempts"]), **payload)
+        except LeaseLost:
+            logger.warning("Lost the lease on job %s (%s); another worker has it", job_id, kind)
+            JOBS.inc(kind, "lease_lost")
+        except Exception as e:
+            logger.exception("Job %s (%s) failed on attempt %s", job_id, kind, job["attempts"])
+            self._retry_or_fail(job, f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job_id, SUCCEEDED, result=json.dumps(result, default=str), error=None)
+            JOBS.inc(kind, "succeeded")
+        finally:
+            self._running.pop(job_id, None)
+            JOB_LATENCY.observe(kind, value=time.perf_counter() - started)
+
+    def _retry_or_fail(self, job: dict, error: str):
+        if job["attempts"] < job["max_attempts"]:
+            self._update(job["id"], status=QUEUED, error=error, lease_owner=None, lease_expires_at=None,
+                         run_at=_now() + timedelta(seconds=backoff(job["attempts"])))
+            JOBS.inc(job["kind"], "retried")
+        else:
+            self._fail(job, error)
+
+    def _fail(self, job: dict, error: str):
+        self._finish(job["id"], FAILED, error=error)
+        JOBS.inc(job["kind"], "failed")
+        spec = _handlers.get(job["kind"])
+        if spec is not None and spec.on_failure is not None:
+            try:
+                spec.on_failure(**json.loads(job["payload"] or "{}"))
+            except Exception:
+                logger.exception("Failure hook for job %s (%s) failed", job["id"], job["kind"])
+
+    def _finish(self, job_id: int, status: str, **values):
+        if status == SUCCEEDED:
+            values["progress"] = 100
+        self._update(job_id, status=status, finished_at=_now(), lease_owner=None, lease_expires_at=None, **values)
+
+    def _update(self, job_id: int, **values):
+        # Conditional on still holding the lease, so a worker that stalled
+        # past its lease can't overwrite the new owner's state
+        with engine.begin() as conn:
+            conn.execute(
+                update(_jobs)
+                .where(_jobs.c.id == job_id, _jobs.c.status == RUNNING, _jobs.c.lease_owner == self.owner)
+                .values(**values)
+            )
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._cond:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, self.processes),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.lease_seconds / 3):
+            job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(_jobs)
+                        .where(_jobs.c.id.in_(job_ids), _jobs.c.status == RUNNING, _jobs.c.lease_owner == self.owner)
+                        .values(lease_expires_at=_now() + timedelta(seconds=self.lease_seconds))
+                    )
+            except Exception:
+                logger.exception("Could not renew job leases")
+
+
+worker_pool = WorkerPool(
+    threads=settings.JOB_WORKERS,
+    processes=settings.JOB_PROCESSES,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_seconds=settings.JOB_POLL_SECONDS,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--work", action="store_true", help="run a worker pool until interrupted")
+    parser.add_argument("--threads", type=int, default=max(1, settings.JOB_WORKERS))
+    args = parser.parse_args()
+    if not args.work:
+        parser.print_help()
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    # Import the modules that register handlers
+    import ats_scoring, bulk_import, resume_parser  # noqa: F401
+    worker_pool.threads = args.threads
+    worker_pool.start()
+    print(f"Job worker {worker_pool.owner} running {args.threads} threads; Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import engine, async_engine, replica_engines, async_replica_engines, LAST_WRITE_HEADER, ReadYourWritesMiddleware
 from config import settings
-from routes import auth_routes, profile_routes, resume_routes, interview_routes
+from hashing import hash_pool, bulk_hash_pool
+import metrics, migrations, resume_parser, interview_bank, availability, health
+from activity import activity_log
+from jobs import worker_pool
+from routes import auth_routes, profile_routes, resume_routes, interview_routes, admin_routes, search_routes, roadmap_routes, skill_routes, job_routes
 import logging
 import sys
 
@@ -13,11 +19,42 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)]
 )
 
-# Create tables automatically
-Base.metadata.create_all(bind=engine)
+# Count queries and DB time per request
+for db_engine in [engine, *replica_engines]:
+    metrics.instrument_engine(db_engine)
+if async_engine is not None:
+    for db_engine in [async_engine, *async_replica_engines]:
+        metrics.instrument_engine(db_engine.sync_engine)
+
+# The schema and the compiled interview bank are brought up to date once per
+# deploy by run.py (or migrate_database.py), not on every worker import;
+# workers refuse to start against a schema that is behind (e.g. `uvicorn
+# main:app` on a fresh database)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    migrations.check(engine)
+    # Open DB connections and start the worker pools before taking traffic
+    await health.warm_up()
+    hash_pool.start()
+    resume_parser.start()
+    interview_bank.start()
+    availability.index.load()
+    activity_log.start()
+    worker_pool.start()
+    yield
+    worker_pool.shutdown()
+    # Write out queued activity events before the worker exits
+    activity_log.shutdown()
+    hash_pool.shutdown()
+    bulk_hash_pool.shutdown()
+    resume_parser.shutdown()
+    if async_engine is not None:
+        for db_engine in [async_engine, *async_replica_engines]:
+            await db_engine.dispose()
 
 # Create FastAPI app
-app = FastAPI(title=settings.APP_NAME, debug=settings.DEBUG)
+app = FastAPI(title=settings.APP_NAME, debug=settings.DEBUG, lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,22 +63,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=[LAST_WRITE_HEADER],
 )
 
+# Per-route latency, in-flight requests and slow-request logging
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Last-write tokens, so a client's reads after its own writes skip lagging replicas
+if settings.DB_REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # Include routers
 app.include_router(auth_routes.router)
 app.include_router(profile_routes.router)
 app.include_router(resume_routes.router)
 app.include_router(interview_routes.router)
+app.include_router(admin_routes.router)
+app.include_router(search_routes.router)
+app.include_router(roadmap_routes.router)
+app.include_router(skill_routes.router)
+app.include_router(job_routes.router)
 
 @app.get("/")
 def read_root():
     return {"message": "AI Career Toolkit API is running!"}
 
 @app.get("/health")
+@app.get("/health/live")
 def health_check():
+    """Liveness: the process is up and serving"""
     return {"status": "healthy", "app": settings.APP_NAME}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: warmed up, database answering and connection pool not saturated"""
+    ready, body = await health.readiness()
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test")
 def test_endpoint():
     return {"message": "Backend is working!", "timestamp": "2025-09-21"}
@@ -0,0 +1,265 @@
+"""
+In-process metrics in Prometheus text format.
+
+MetricsMiddleware times every request per route template and tracks
+in-flight requests. SQLAlchemy cursor events and the password hashing code
+add their time to the current request's RequestStats (held in a context
+variable, which follows the request into threadpool and run_sync calls), so
+slow requests can be logged with a breakdown of where their time went.
+
+Metrics are per process; each worker serves its own numbers on /metrics.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import event
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, *labels, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        lines = self.header()
+        names = self.labelnames + ("le",)
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served"))
+REQUEST_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Database queries per request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50)))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Database queries executed"))
+DB_LATENCY = registry.register(Histogram(
+    "db_query_duration_seconds", "Database query latency",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+HASH_LATENCY = registry.register(Histogram(
+    "password_hash_duration_seconds", "Time spent hashing or verifying passwords", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)))
+HASH_REJECTED = registry.register(Counter(
+    "password_hash_rejected_total", "Hash operations refused by a full or slow hashing pool",
+    ("operation", "reason")))
+
+# Distinct statements kept per request for slow-request breakdowns
+MAX_TRACKED_STATEMENTS = 20
+
+
+class RequestStats:
+    """Where the current request spent its time"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.statements: Dict[str, list] = {}
+
+    def add_query(self, statement: str, seconds: float):
+        self.db_queries += 1
+        self.db_seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None and len(self.statements) < MAX_TRACKED_STATEMENTS:
+            entry = self.statements[statement] = [0, 0.0]
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += seconds
+
+
+current_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+
+
+# Database instrumentation
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERIES.inc()
+    DB_LATENCY.observe(value=elapsed)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add_query(statement, elapsed)
+
+
+def instrument_engine(engine):
+    """Count queries and DB time for a (sync) SQLAlchemy engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def record_hash(operation: str, seconds: float):
+    """Record time spent in password hashing or verification"""
+    HASH_LATENCY.observe(operation, value=seconds)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.hash_seconds += seconds
+
+
+# Request instrumentation
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, in-flight requests and slow requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        state = {"status": 500, "done": False}
+
+        def finish():
+            # Background tasks run after the response inside the same app call;
+            # they shouldn't count towards the request's latency
+            if state["done"]:
+                return
+            state["done"] = True
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            # Label by route template so path parameters don't explode cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(state["status"]))
+            REQUEST_LATENCY.observe(method, route, value=elapsed)
+            REQUEST_QUERIES.observe(route, value=stats.db_queries)
+            if elapsed >= settings.SLOW_REQUEST_SECONDS:
+                _log_slow_request(method, route, state["status"], elapsed, stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            current_stats.reset(token)
+
+
+def _log_slow_request(method: str, route: str, status_code: int, elapsed: float, stats: RequestStats):
+    breakdown = "; ".join(
+        f"{count}x {seconds * 1000:.1f}ms {' '.join(statement.split())[:120]}"
+        for statement, (count, seconds) in sorted(
+            stats.statements.items(), key=lambda item: item[1][1], reverse=True
+        )
+    )
+    logger.warning(
+        "Slow request %s %s -> %s in %.1fms (db: %d queries %.1fms, hashing: %.1fms) %s",
+        method, route, status_code, elapsed * 1000,
+        stats.db_queries, stats.db_seconds * 1000, stats.hash_seconds * 1000, breakdown,
+    )
@@ -0,0 +1,478 @@
+"""
+Versioned, resumable database migrations.
+
+Each step has a version number and is recorded in the schema_migrations
+table once it completes. Data backfills subclass ChunkedStep: they walk the
+rows to change in primary-key order, one short transaction per chunk, and
+store the last processed key in the same transaction so a killed run picks
+up where it stopped.
+"""
+
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, create_engine, func, inspect, select, text, update,
+)
+from sqlalchemy.engine import Connection, Engine
+from config import settings
+from database import Base
+import models, search, skills, interview_bank
+
+DEFAULT_CHUNK_SIZE = 1000
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("checkpoint", Integer, nullable=True),
+    Column("started_at", DateTime(timezone=True), server_default=func.now()),
+    Column("completed_at", DateTime(timezone=True), nullable=True),
+)
+
+
+class BaseStep(ABC):
+    """A single migration; subclass Step or ChunkedStep (and override count() for dry runs)"""
+
+    version: int = 0
+    name: str = ""
+
+    def count(self, conn: Connection) -> int:
+        """Number of rows this step will touch (used by dry runs)"""
+        return 0
+
+    def estimate(self, conn: Connection, rows: int) -> float:
+        """Estimated run time in seconds"""
+        return 0.0
+
+    @abstractmethod
+    def run(self, engine: Engine, checkpoint: Optional[int]):
+        """Apply the step and mark it complete"""
+
+
+class Step(BaseStep):
+    """A step applied in one transaction"""
+
+    def run(self, engine: Engine, checkpoint: Optional[int]):
+        with engine.begin() as conn:
+            self.apply(conn)
+            _complete(conn, self)
+
+    @abstractmethod
+    def apply(self, conn: Connection):
+        """Make the change"""
+
+
+class ChunkedStep(BaseStep):
+    """A backfill processed in keyset-ordered chunks, one commit per chunk"""
+
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    # Statements per chunk besides the fetch, used for estimates
+    statements_per_chunk: int = 2
+
+    @abstractmethod
+    def fetch_chunk(self, conn: Connection, after: Optional[int], limit: int) -> list:
+        """Return up to limit rows with keys greater than after, ordered by key"""
+
+    @abstractmethod
+    def apply_chunk(self, conn: Connection, rows: list):
+        """Change the rows of one chunk"""
+
+    def estimate(self, conn: Connection, rows: int) -> float:
+        if not rows:
+            return 0.0
+        # Time one read-only chunk fetch and scale by the number of chunks
+        started = time.perf_counter()
+        self.fetch_chunk(conn, None, self.chunk_size)
+        elapsed = time.perf_counter() - started
+        chunks = math.ceil(rows / self.chunk_size)
+        return chunks * elapsed * (1 + self.statements_per_chunk)
+
+    def run(self, engine: Engine, checkpoint: Optional[int]):
+        while True:
+            with engine.begin() as conn:
+                rows = self.fetch_chunk(conn, checkpoint, self.chunk_size)
+                if not rows:
+                    _complete(conn, self)
+                    return
+                self.apply_chunk(conn, rows)
+                checkpoint = rows[-1][0]
+                conn.execute(
+                    update(schema_migrations)
+                    .where(schema_migrations.c.version == self.version)
+                    .values(checkpoint=checkpoint)
+                )
+            print(f"  {self.name}: processed {len(rows)} rows (up to key {checkpoint})")
+
+
+def _complete(conn: Connection, step: BaseStep):
+    conn.execute(
+        update(schema_migrations)
+        .where(schema_migrations.c.version == step.version)
+        .values(completed_at=func.now())
+    )
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return False
+    return any(c["name"] == column for c in inspector.get_columns(table))
+
+
+def _indexes(conn: Connection, table: str) -> set:
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+# Steps
+
+class CreateTables(Step):
+    version = 1
+    name = "create_tables"
+
+    def apply(self, conn: Connection):
+        Base.metadata.create_all(bind=conn)
+
+
+class AddUsernameColumn(Step):
+    version = 2
+    name = "add_username_column"
+
+    def apply(self, conn: Connection):
+        if not _has_column(conn, "users", "username"):
+            conn.execute(text("ALTER TABLE users ADD COLUMN username VARCHAR(255) NULL"))
+
+
+class AddResumeUploadColumns(Step):
+    version = 4
+    name = "add_resume_upload_columns"
+
+    def apply(self, conn: Connection):
+        columns = [
+            ("content_hash", "VARCHAR(64) NULL"),
+            ("file_size", "INTEGER NULL"),
+            ("status", "VARCHAR(20) NOT NULL DEFAULT 'pending'"),
+        ]
+        for column, ddl in columns:
+            if not _has_column(conn, "resumes", column):
+                conn.execute(text(f"ALTER TABLE resumes ADD COLUMN {column} {ddl}"))
+        if "ix_resumes_content_hash" not in _indexes(conn, "resumes"):
+            conn.execute(text("CREATE INDEX ix_resumes_content_hash ON resumes (content_hash)"))
+
+
+class AddResumeListingIndex(Step):
+    version = 5
+    name = "add_resume_listing_index"
+
+    def apply(self, conn: Connection):
+        if "ix_resumes_profile_id_created_at" not in _indexes(conn, "resumes"):
+            conn.execute(text(
+                "CREATE INDEX ix_resumes_profile_id_created_at ON resumes (profile_id, created_at)"
+            ))
+
+
+class CreateSearchIndex(Step):
+    version = 6
+    name = "create_search_index"
+
+    def apply(self, conn: Connection):
+        # Existing rows are indexed by `python search.py --rebuild`
+        search.create_index(conn)
+
+
+class AddProfileRevision(Step):
+    version = 7
+    name = "add_profile_revision"
+
+    def apply(self, conn: Connection):
+        if not _has_column(conn, "profiles", "revision"):
+            conn.execute(text("ALTER TABLE profiles ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"))
+
+
+class CreateInterviewAnswers(Step):
+    version = 8
+    name = "create_interview_answers"
+
+    def apply(self, conn: Connection):
+        models.InterviewAnswer.__table__.create(bind=conn, checkfirst=True)
+
+
+class CreateSkillTables(Step):
+    version = 9
+    name = "create_skill_tables"
+
+    def apply(self, conn: Connection):
+        for model in (models.Skill, models.SkillAlias, models.ProfileSkill):
+            model.__table__.create(bind=conn, checkfirst=True)
+        skills.seed_dictionary(conn)
+
+
+class BackfillProfileSkills(ChunkedStep):
+    """Parse every profile's free-text skills into profile_skills"""
+
+    version = 10
+    name = "backfill_profile_skills"
+
+    def count(self, conn: Connection) -> int:
+        return conn.execute(
+            select(func.count()).select_from(models.Profile.__table__)
+            .where(models.Profile.__table__.c.skills.is_not(None))
+        ).scalar()
+
+    def fetch_chunk(self, conn: Connection, after: Optional[int], limit: int) -> list:
+        profiles = models.Profile.__table__
+        query = select(profiles.c.id, profiles.c.skills).where(profiles.c.skills.is_not(None))
+        if after is not None:
+            query = query.where(profiles.c.id > after)
+        return conn.execute(query.order_by(profiles.c.id).limit(limit)).all()
+
+    def apply_chunk(self, conn: Connection, rows: list):
+        skills.replace_profile_skills(conn, dict(rows))
+
+
+class CreateActivityEvents(Step):
+    version = 11
+    name = "create_activity_events"
+
+    def apply(self, conn: Connection):
+        models.ActivityEvent.__table__.create(bind=conn, checkfirst=True)
+
+
+class CreateJobs(Step):
+    version = 12
+    name = "create_jobs"
+
+    def apply(self, conn: Connection):
+        models.Job.__table__.create(bind=conn, checkfirst=True)
+
+
+class CreateInterviewProgress(Step):
+    version = 13
+    name = "create_interview_progress"
+
+    def apply(self, conn: Connection):
+        models.InterviewProgress.__table__.create(bind=conn, checkfirst=True)
+
+
+class LowercaseUserNames(ChunkedStep):
+    """Lowercase existing usernames and emails, which are now stored lowercase"""
+
+    version = 14
+    name = "lowercase_user_names"
+
+    def count(self, conn: Connection) -> int:
+        if not inspect(conn).has_table("users"):
+            return 0
+        # Every row is checked; MySQL's case-insensitive collation can't filter them in SQL
+        return conn.execute(text("SELECT COUNT(*) FROM users")).scalar()
+
+    def fetch_chunk(self, conn: Connection, after: Optional[int], limit: int) -> list:
+        users = models.User.__table__
+        query = select(users.c.id, users.c.username, users.c.email)
+        if after is not None:
+            query = query.where(users.c.id > after)
+        return conn.execute(query.order_by(users.c.id).limit(limit)).all()
+
+    def apply_chunk(self, conn: Connection, rows: list):
+        users = models.User.__table__
+        changes = {}
+        for column in ("username", "email"):
+            wanted = {row.id: getattr(row, column).lower() for row in rows
+                      if getattr(row, column) and getattr(row, column) != getattr(row, column).lower()}
+            if not wanted:
+                continue
+            # Owners of the lowercase names: exact matches on SQLite, any case
+            # on MySQL (including the row itself)
+            owners = {}
+            for user_id, name in conn.execute(
+                select(users.c.id, users.c[column]).where(users.c[column].in_(set(wanted.values())))
+            ):
+                owners.setdefault(name.lower(), set()).add(user_id)
+            for user_id, name in wanted.items():
+                if owners.get(name, set()) - {user_id}:
+                    # Only possible where the collation was case-sensitive; left for an admin to resolve
+                    print(f"  {self.name}: user {user_id} keeps its {column}, {name!r} belongs to another user")
+                    continue
+                owners[name] = {user_id}
+                changes.setdefault(user_id, {})[column] = name
+        for user_id, values in changes.items():
+            conn.execute(update(users).where(users.c.id == user_id).values(**values))
+
+
+class BackfillUsernames(ChunkedStep):
+    """Give users with a NULL username one derived from their email"""
+
+    version = 3
+    name = "backfill_usernames"
+    # Suffixes tried per lookup query when a base username is taken
+    suffix_batch = 10
+
+    def count(self, conn: Connection) -> int:
+        if not inspect(conn).has_table("users"):
+            return 0
+        if not _has_column(conn, "users", "username"):
+            # The column is added by an earlier step, so every row needs a name
+            return conn.execute(text("SELECT COUNT(*) FROM users")).scalar()
+        users = models.User.__table__
+        return conn.execute(
+            select(func.count()).select_from(users).where(users.c.username.is_(None))
+        ).scalar()
+
+    def estimate(self, conn: Connection, rows: int) -> float:
+        if not _has_column(conn, "users", "username"):
+            return 0.0
+        return super().estimate(conn, rows)
+
+    def fetch_chunk(self, conn: Connection, after: Optional[int], limit: int) -> list:
+        users = models.User.__table__
+        query = select(users.c.id, users.c.email).where(users.c.username.is_(None))
+        if after is not None:
+            query = query.where(users.c.id > after)
+        return conn.execute(query.order_by(users.c.id).limit(limit)).all()
+
+    @staticmethod
+    def base_username(email: str) -> str:
+        # Part before @, cleaned to match the username validation rules (stored lowercase)
+        username = re.sub(r"[^a-zA-Z0-9_]", "", email.split("@")[0]).lower()
+        if len(username) < 3:
+            username = username + "123"
+        return username[:20]
+
+    def apply_chunk(self, conn: Connection, rows: list):
+        users = models.User.__table__
+        pending = {user_id: self.base_username(email) for user_id, email in rows}
+        assigned = {}
+        taken = set()
+        start = 0
+        # Try base, base1, base2, ... for every pending row with one IN query
+        # per round instead of one SELECT per candidate
+        while pending:
+            suffixes = range(start, start + self.suffix_batch)
+            candidates = {
+                f"{base}{n or ''}" for base in pending.values() for n in suffixes
+            } - taken
+            # MySQL's collation matches case-insensitively, so compare lowercase
+            # or a stored John1 would let john1 through to the unique index
+            taken.update(name.lower() for name in conn.execute(
+                select(users.c.username).where(users.c.username.in_(candidates))
+            ).scalars())
+            for user_id, base in list(pending.items()):
+                for n in suffixes:
+                    candidate = f"{base}{n or ''}"
+                    if candidate not in taken:
+                        assigned[user_id] = candidate
+                        taken.add(candidate)
+                        del pending[user_id]
+                        break
+            start += self.suffix_batch
+
+        conn.execute(
+            text("UPDATE users SET username = :username WHERE id = :user_id"),
+            [{"username": username, "user_id": user_id} for user_id, username in assigned.items()],
+        )
+
+
+STEPS: List[BaseStep] = [
+    CreateTables(),
+    AddUsernameColumn(),
+    BackfillUsernames(),
+    AddResumeUploadColumns(),
+    AddResumeListingIndex(),
+    CreateSearchIndex(),
+    AddProfileRevision(),
+    CreateInterviewAnswers(),
+    CreateSkillTables(),
+    BackfillProfileSkills(),
+    CreateActivityEvents(),
+    CreateJobs(),
+    CreateInterviewProgress(),
+    LowercaseUserNames(),
+]
+
+
+def _state(conn: Connection) -> dict:
+    rows = conn.execute(select(schema_migrations)).mappings().all()
+    return {row["version"]: row for row in rows}
+
+
+def pending_steps(engine: Engine) -> list:
+    """(step, checkpoint) pairs for steps that have not completed yet"""
+    with engine.connect() as conn:
+        state = _state(conn) if inspect(conn).has_table("schema_migrations") else {}
+    pending = []
+    for step in sorted(STEPS, key=lambda s: s.version):
+        row = state.get(step.version)
+        if row is None or row["completed_at"] is None:
+            pending.append((step, row["checkpoint"] if row else None))
+    return pending
+
+
+class SchemaOutOfDate(RuntimeError):
+    """Raised by check() when migrations haven't been applied"""
+
+
+def check(engine: Engine):
+    """Fail fast if the schema is behind, rather than on the first query of a missing table"""
+    pending = pending_steps(engine)
+    if pending:
+        names = ", ".join(f"{step.version:04d} {step.name}" for step, _ in pending)
+        raise SchemaOutOfDate(
+            f"The database schema is not up to date ({len(pending)} pending: {names}). "
+            "Run `python migrate_database.py` (run.py does this on start) before serving main:app."
+        )
+
+
+def migrate(engine: Engine, chunk_size: Optional[int] = None):
+    """Apply every pending step, resuming interrupted backfills"""
+    metadata.create_all(bind=engine)
+    pending = pending_steps(engine)
+    if not pending:
+        print("Database is up to date.")
+        return
+    for step, checkpoint in pending:
+        if chunk_size and isinstance(step, ChunkedStep):
+            step.chunk_size = chunk_size
+        if checkpoint is None:
+            with engine.begin() as conn:
+                if step.version not in _state(conn):
+                    conn.execute(schema_migrations.insert().values(version=step.version, name=step.name))
+            print(f"Applying {step.version:04d} {step.name}...")
+        else:
+            print(f"Resuming {step.version:04d} {step.name} after key {checkpoint}...")
+        step.run(engine, checkpoint)
+    print("Migration completed successfully!")
+
+
+def prepare():
+    """Bring the schema and the compiled question bank up to date once, before any web worker starts"""
+    # A throwaway engine, so no pooled connection outlives this step into forked workers
+    engine = create_engine(settings.database_url)
+    try:
+        migrate(engine)
+    finally:
+        engine.dispose()
+    interview_bank.compile_if_stale()
+
+
+def dry_run(engine: Engine, chunk_size: Optional[int] = None):
+    """Report pending steps with row counts and estimated run time"""
+    pending = pending_steps(engine)
+    if not pending:
+        print("Database is up to date.")
+        return
+    total = 0.0
+    with engine.connect() as conn:
+        for step, checkpoint in pending:
+            if chunk_size and isinstance(step, ChunkedStep):
+                step.chunk_size = chunk_size
+            rows = step.count(conn)
+            seconds = step.estimate(conn, rows)
+            total += seconds
+            resume = f", resuming after key {checkpoint}" if checkpoint is not None else ""
+            print(f"{step.version:04d} {step.name}: {rows} rows, ~{seconds:.1f}s{resume}")
+    print(f"Estimated total: ~{total:.1f}s")
@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
+# SQLite compares timestamps as text, so store them in the same format that
+# CURRENT_TIMESTAMP produces or bound values won't compare correctly
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -10,8 +18,8 @@ class User(Base):
     username = Column(String(255), unique=True, index=True, nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, onupdate=func.now())
     
     # Relationship
     profile = relationship("Profile", back_populates="user", uselist=False)
@@ -25,8 +33,10 @@ class Profile(Base):
     career_goals = Column(Text, nullable=True)
     education = Column(Text, nullable=True)
     skills = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped on every update; used for ETags
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="profile")
@@ -34,6 +44,10 @@ class Profile(Base):
 
 class Resume(Base):
     __tablename__ = "resumes"
+    __table_args__ = (
+        # Serves keyset-paginated listings of a profile's resumes
+        Index("ix_resumes_profile_id_created_at", "profile_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
@@ -41,7 +55,109 @@ class Resume(Base):
     file_path = Column(String(500), nullable=False)
     parsed_content = Column(Text, nullable=True)
     ats_score = Column(Integer, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    content_hash = Column(String(64), index=True, nullable=True)
+    file_size = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationship
-    profile = relationship("Profile", back_populates="resumes")
\ No newline at end of file
+    profile = relationship("Profile", back_populates="resumes")
+
+class InterviewAnswer(Base):
+    __tablename__ = "interview_answers"
+    __table_args__ = (
+        Index("ix_interview_answers_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Id of a question in the interview bank (interview_bank.py), not a table row
+    question_id = Column(Integer, nullable=False)
+    answer = Column(Text, nullable=False)
+    created_at = Column(Timestamp, server_default=func.now())
+
+class InterviewProgress(Base):
+    """Where a user is in the question order for one interview filter"""
+    __tablename__ = "interview_progress"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # "role|difficulty|tag", empty for an unset filter
+    filter_key = Column(String(255), primary_key=True)
+    # Bank the count refers to; a recompiled bank starts the filter over
+    checksum = Column(String(16), nullable=False)
+    # Questions drawn so far, over every pass through the filter's pool
+    served = Column(Integer, nullable=False, default=0)
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+
+class Skill(Base):
+    __tablename__ = "skills"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Canonical, normalized name (see skills.normalize)
+    name = Column(String(100), unique=True, nullable=False)
+
+class SkillAlias(Base):
+    __tablename__ = "skill_aliases"
+    
+    alias = Column(String(100), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), nullable=False)
+
+class ProfileSkill(Base):
+    __tablename__ = "profile_skills"
+    __table_args__ = (
+        # Profiles having a given skill
+        Index("ix_profile_skills_skill_id", "skill_id"),
+    )
+    
+    profile_id = Column(Integer, ForeignKey("profiles.id"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id"), primary_key=True)
+
+class ActivityEvent(Base):
+    __tablename__ = "activity_events"
+    __table_args__ = (
+        Index("ix_activity_events_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: events are written in the background (see activity.py)
+    # and may arrive after the user is gone
+    user_id = Column(Integer, nullable=True)
+    event = Column(String(50), nullable=False)
+    # JSON object with event-specific fields
+    detail = Column(Text, nullable=True)
+    ip = Column(String(45), nullable=True)
+    # When the event happened (UTC), set by the application rather than at insert
+    created_at = Column(Timestamp, nullable=False)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Serves the claim query: runnable jobs by priority, then due time
+        Index("ix_jobs_status_priority_run_at", "status", "priority", "run_at"),
+        Index("ix_jobs_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Handler name registered with jobs.handler()
+    kind = Column(String(50), nullable=False)
+    # JSON keyword arguments for the handler
+    payload = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default="queued", server_default="queued")
+    # Higher runs first
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False, default=3, server_default="3")
+    # Job timestamps are UTC set by the application, so leases compare
+    # correctly whatever the database server's time zone
+    run_at = Column(Timestamp, nullable=False)
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(Timestamp, nullable=True)
+    progress = Column(Integer, nullable=False, default=0, server_default="0")
+    message = Column(String(255), nullable=True)
+    # JSON return value of the handler
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(Timestamp, nullable=False)
+    started_at = Column(Timestamp, nullable=True)
+    finished_at = Column(Timestamp, nullable=True)
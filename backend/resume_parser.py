@@ -0,0 +1,241 @@
+"""
+Background text extraction for uploaded resumes.
+
+Uploads are stored with status "pending" together with a "resume.parse" job
+(jobs.py), whose handler extracts and normalizes the text in a process pool
+and records the result on the Resume row. Being a job, a parse interrupted by
+a dying or recycled worker is picked up again when its lease expires, and a
+failed parse is retried with backoff until JOB_MAX_ATTEMPTS. Clients poll the
+row's status.
+
+    python resume_parser.py --requeue   # queue parses for rows left unparsed (e.g. before jobs existed)
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import unicodedata
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+import models, ats_scoring, jobs, search
+
+logger = logging.getLogger(__name__)
+
+# Resume.status values
+PENDING = "pending"
+PROCESSING = "processing"
+PARSED = "parsed"
+FAILED = "failed"
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional; fall back to the built-in PDF text scanner
+    PdfReader = None
+
+
+# Extraction (runs in the worker processes)
+
+_PDF_STREAM = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+_PDF_TEXT_BLOCK = re.compile(rb"BT(.*?)ET", re.S)
+_PDF_STRING = re.compile(rb"\((?:\\.|[^\\)])*\)")
+# A TJ array (kerned pieces of one run) or a single string shown with Tj/'/"
+_PDF_SHOW = re.compile(rb"\[((?:\\.|[^\]\\])*)\]\s*TJ|(\((?:\\.|[^\\)])*\))\s*(?:Tj|'|\")")
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"", b"f": b"", b"(": b"(", b")": b")", b"\\": b"\\"}
+
+
+def _pdf_string(literal: bytes) -> bytes:
+    return re.sub(rb"\\(\d{1,3}|.)", lambda m: (
+        bytes([int(m.group(1), 8) & 0xFF]) if m.group(1).isdigit() else _PDF_ESCAPES.get(m.group(1), m.group(1))
+    ), literal[1:-1])
+
+
+def _pdf_text(path: str) -> str:
+    if PdfReader is not None:
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+    # Best effort: pull literal strings out of the text blocks of each
+    # (optionally Flate-compressed) content stream
+    with open(path, "rb") as f:
+        data = f.read()
+    lines = []
+    for stream in _PDF_STREAM.findall(data):
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for block in _PDF_TEXT_BLOCK.findall(stream):
+            pieces = []
+            for array, literal in _PDF_SHOW.findall(block):
+                if literal:
+                    pieces.append(_pdf_string(literal))
+                else:
+                    pieces.append(b"".join(_pdf_string(s) for s in _PDF_STRING.findall(array)))
+            text = b" ".join(pieces)
+            if text:
+                lines.append(text.decode("latin-1"))
+    return "\n".join(lines)
+
+
+def _docx_text(path: str) -> str:
+    with zipfile.ZipFile(path) as archive:
+        xml = archive.read("word/document.xml").decode("utf-8")
+    xml = re.sub(r"</w:p>", "\n", xml)
+    xml = re.sub(r"<w:tab/>", "\t", xml)
+    text = re.sub(r"<[^>]+>", "", xml)
+    for entity, char in (("&lt;", "<"), ("&gt;", ">"), ("&quot;", '"'), ("&apos;", "'"), ("&amp;", "&")):
+        text = text.replace(entity, char)
+    return text
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace, keeping one line per paragraph"""
+    text = unicodedata.normalize("NFKC", text)
+    lines = (re.sub(r"\s+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def extract_text(path: str, filename: str) -> str:
+    """Extract normalized text from a stored resume file"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".pdf":
+        text = _pdf_text(path)
+    elif extension == ".docx":
+        text = _docx_text(path)
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    return normalize_text(text)
+
+
+# Worker pool
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def start():
+    """Start the parsing worker processes"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.RESUME_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+# Pipeline
+
+def _claim(resume_id: int):
+    db = SessionLocal()
+    try:
+        resume = db.get(models.Resume, resume_id)
+        # PROCESSING too: the job's lease makes this the only live attempt, so a
+        # row left processing was abandoned by a worker that died
+        if resume is None or resume.status == PARSED:
+            return None
+        resume.status = PROCESSING
+        # Identical content that was already parsed doesn't need parsing again
+        parsed = db.query(models.Resume.parsed_content).filter(
+            models.Resume.content_hash == resume.content_hash,
+            models.Resume.status == PARSED,
+        ).first()
+        claimed = resume.file_path, resume.filename, parsed[0] if parsed else None
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _finish(resume_id: int, status: str, text: Optional[str]):
+    db = SessionLocal()
+    try:
+        resume = db.get(models.Resume, resume_id)
+        if resume is not None:
+            resume.status = status
+            resume.parsed_content = text
+            if text is not None:
+                resume.ats_score = ats_scoring.score_resume(text, resume.profile.career_goals)
+                search.index_resume(db, resume)
+            db.commit()
+    finally:
+        db.close()
+
+
+def enqueue(db: Session, resume: models.Resume, user_id: Optional[int] = None) -> models.Job:
+    """Queue parsing of a resume; commits the session (and with it a new resume row)"""
+    db.flush()
+    return jobs.enqueue(db, "resume.parse", {"resume_id": resume.id}, priority=5, user_id=user_id)
+
+
+@jobs.handler("resume.parse")
+def parse_job(context: jobs.JobContext, resume_id: int) -> dict:
+    """Job: extract the text of an uploaded resume and store it on the row"""
+    claimed = _claim(resume_id)
+    if claimed is None:
+        return {"status": "skipped"}
+    path, filename, text = claimed
+
+    if text is None:
+        if _executor is None:
+            start()
+        try:
+            text = _executor.submit(extract_text, path, filename).result()
+        except Exception:
+            logger.exception("Failed to parse resume %s", resume_id)
+            _finish(resume_id, FAILED, None)
+            # Failing the job retries it with backoff, until its last attempt
+            raise
+
+    _finish(resume_id, PARSED, text)
+    return {"status": PARSED}
+
+
+def requeue(db: Session) -> int:
+    """Queue a parse for every unparsed resume that has no parse job outstanding"""
+    outstanding = {
+        json.loads(payload).get("resume_id")
+        for payload in db.execute(
+            select(models.Job.payload).where(
+                models.Job.kind == "resume.parse", models.Job.status.in_((jobs.QUEUED, jobs.RUNNING))
+            )
+        ).scalars()
+    }
+    queued = 0
+    resumes = db.query(models.Resume).filter(models.Resume.status.in_((PENDING, PROCESSING, FAILED))).all()
+    for resume in resumes:
+        if resume.id not in outstanding:
+            enqueue(db, resume)
+            queued += 1
+    return queued
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume parsing")
+    parser.add_argument("--requeue", action="store_true", help="queue parses for pending, stuck or failed resumes")
+    args = parser.parse_args()
+    if not args.requeue:
+        parser.print_help()
+        return
+    db = SessionLocal()
+    try:
+        print(f"Queued {requeue(db)} resumes for parsing.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
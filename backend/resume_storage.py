@@ -0,0 +1,161 @@
+"""
+Streaming, content-addressed storage for uploaded resumes.
+
+Multipart bodies are parsed as they arrive and the file part is written to
+disk in fixed-size chunks while its SHA-256 is computed, so a whole upload
+is never held in memory. Stored files are named by their digest, which
+deduplicates identical uploads.
+"""
+import hashlib
+import os
+import tempfile
+from typing import NamedTuple
+from fastapi import Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from config import settings
+
+ALLOWED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+
+class InvalidUpload(Exception):
+    """The request body isn't an acceptable resume upload"""
+
+
+class UploadTooLarge(Exception):
+    """The uploaded file is bigger than RESUME_MAX_BYTES"""
+
+
+class StoredFile(NamedTuple):
+    filename: str
+    content_hash: str
+    size: int
+    path: str
+
+
+def content_path(content_hash: str) -> str:
+    """Location of the stored file with the given SHA-256"""
+    return os.path.join(settings.UPLOAD_DIR, content_hash[:2], content_hash)
+
+
+class _Writer:
+    """Writes fixed-size blocks to a temporary file, hashing as it goes"""
+
+    def __init__(self):
+        tmp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, block: bytes):
+        self.file.write(block)
+        self.digest.update(block)
+        self.size += len(block)
+
+    def commit(self) -> str:
+        """Move the file to its content address, dropping it if already stored"""
+        self.file.close()
+        content_hash = self.digest.hexdigest()
+        path = content_path(content_hash)
+        if os.path.exists(path):
+            os.remove(self.file.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.file.name, path)
+        return content_hash
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.file.name):
+            os.remove(self.file.name)
+
+
+async def receive_upload(request: Request, field: str = "file") -> StoredFile:
+    """Stream the multipart file part named field to content-addressed storage"""
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise InvalidUpload("Expected a multipart/form-data body")
+
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    part = {"header_name": b"", "header_value": b"", "disposition": b""}
+    state = {"capturing": False, "filename": None, "received": 0}
+    buffer = bytearray()
+
+    def on_part_begin():
+        part.update(header_name=b"", header_value=b"", disposition=b"")
+
+    def on_header_field(data, start, end):
+        part["header_name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["header_value"] += data[start:end]
+
+    def on_header_end():
+        if part["header_name"].lower() == b"content-disposition":
+            part["disposition"] = part["header_value"]
+        part["header_name"] = part["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["disposition"])
+        if options.get(b"name", b"").decode("utf-8", "replace") != field or b"filename" not in options:
+            return
+        if state["filename"] is not None:
+            raise InvalidUpload("Only one file may be uploaded at a time")
+        filename = os.path.basename(options[b"filename"].decode("utf-8", "replace"))
+        if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+            raise InvalidUpload(f"Unsupported file type; allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}")
+        state.update(capturing=True, filename=filename)
+
+    def on_part_data(data, start, end):
+        if state["capturing"]:
+            state["received"] += end - start
+            if state["received"] > settings.RESUME_MAX_BYTES:
+                raise UploadTooLarge()
+            buffer.extend(data[start:end])
+
+    def on_part_end():
+        state["capturing"] = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    writer = await run_in_threadpool(_Writer)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            # Hand full blocks to the threadpool so disk I/O never blocks the loop
+            while len(buffer) >= chunk_size:
+                block = bytes(buffer[:chunk_size])
+                del buffer[:chunk_size]
+                await run_in_threadpool(writer.write, block)
+        parser.finalize()
+        if state["filename"] is None:
+            raise InvalidUpload(f"Missing file field '{field}'")
+        if buffer:
+            await run_in_threadpool(writer.write, bytes(buffer))
+        if writer.size == 0:
+            raise InvalidUpload("Uploaded file is empty")
+        content_hash = await run_in_threadpool(writer.commit)
+    except MultipartParseError:
+        await run_in_threadpool(writer.discard)
+        raise InvalidUpload("Malformed multipart body")
+    except BaseException:
+        await run_in_threadpool(writer.discard)
+        raise
+
+    return StoredFile(
+        filename=state["filename"],
+        content_hash=content_hash,
+        size=writer.size,
+        path=content_path(content_hash),
+    )
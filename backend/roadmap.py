@@ -0,0 +1,172 @@
+"""
+Career roadmaps over a skill prerequisite graph.
+
+data/skill_graph.json lists skills with their direct prerequisites and the
+skills each target role needs. It is compiled once into bitmasks: every
+skill's transitive prerequisites, and per role the full set of skills it
+requires (with their prerequisites) in a fixed topological order. A roadmap
+is then the role's order filtered by the skills the user lacks, grouped into
+stages that can be learned in parallel. Plans are cached on the closed skill
+set, so repeat requests for the same skills and role are a dict lookup.
+Each worker compiles the graph on first use; a changed graph file takes
+effect on the next deploy.
+"""
+import functools
+import json
+import threading
+from typing import Iterable, List, Optional, Tuple
+from config import settings
+from skills import normalize
+
+
+class GraphError(Exception):
+    """Raised for an invalid skill graph"""
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SkillGraph:
+    """A compiled skill prerequisite DAG"""
+
+    def __init__(self, config: dict):
+        self.names: List[str] = sorted(normalize(name) for name in config["skills"])
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.aliases = {normalize(alias): self.ids[normalize(target)]
+                        for alias, target in config.get("aliases", {}).items()}
+        self.prerequisites: List[Tuple[int, ...]] = [()] * len(self.names)
+        for name, prerequisites in config["skills"].items():
+            try:
+                self.prerequisites[self.ids[normalize(name)]] = tuple(
+                    sorted(self.ids[normalize(p)] for p in prerequisites)
+                )
+            except KeyError as e:
+                raise GraphError(f"{name} depends on unknown skill {e.args[0]!r}")
+
+        self.order = self._topological_order()
+        self.rank = {skill: i for i, skill in enumerate(self.order)}
+        # ancestors[s]: bitmask of every skill s transitively depends on
+        self.ancestors = [0] * len(self.names)
+        for skill in self.order:
+            for p in self.prerequisites[skill]:
+                self.ancestors[skill] |= self.ancestors[p] | (1 << p)
+
+        self.roles = {}
+        for role, spec in config["roles"].items():
+            required = 0
+            for name in spec["skills"]:
+                skill = self.resolve(name)
+                if skill is None:
+                    raise GraphError(f"Role {role} needs unknown skill {name!r}")
+                required |= 1 << skill
+            mask = self.closure(required)
+            self.roles[role] = {
+                "title": spec.get("title", role),
+                "mask": mask,
+                "order": tuple(sorted(_bits(mask), key=self.rank.__getitem__)),
+            }
+
+        self._plan = functools.lru_cache(maxsize=settings.ROADMAP_CACHE_SIZE)(self._compute_plan)
+
+    def _topological_order(self) -> List[int]:
+        # Kahn's algorithm, taking the alphabetically first ready skill each time
+        # so the order is stable across compiles
+        remaining = [len(p) for p in self.prerequisites]
+        dependents = [[] for _ in self.names]
+        for skill, prerequisites in enumerate(self.prerequisites):
+            for p in prerequisites:
+                dependents[p].append(skill)
+        ready = sorted(skill for skill, count in enumerate(remaining) if count == 0)
+        order = []
+        while ready:
+            skill = ready.pop(0)
+            order.append(skill)
+            for dependent in dependents[skill]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+            ready.sort()
+        if len(order) != len(self.names):
+            cycle = [self.names[s] for s, count in enumerate(remaining) if count]
+            raise GraphError(f"Skill prerequisites contain a cycle involving {cycle}")
+        return order
+
+    def resolve(self, skill: str) -> Optional[int]:
+        name = normalize(skill)
+        skill_id = self.ids.get(name)
+        return skill_id if skill_id is not None else self.aliases.get(name)
+
+    def skill_mask(self, skills: Iterable[str]) -> Tuple[int, List[str]]:
+        """Bitmask of the known skills, plus the inputs that aren't in the graph"""
+        mask, unknown = 0, []
+        for skill in skills:
+            skill_id = self.resolve(skill)
+            if skill_id is None:
+                unknown.append(skill)
+            else:
+                mask |= 1 << skill_id
+        return mask, unknown
+
+    def closure(self, mask: int) -> int:
+        """mask plus every prerequisite of the skills in it"""
+        closed = mask
+        for skill in _bits(mask):
+            closed |= self.ancestors[skill]
+        return closed
+
+    def plan(self, mask: int, role: str) -> dict:
+        """Roadmap from a skill bitmask to a role (cached on the closed skill set)"""
+        if role not in self.roles:
+            raise GraphError(f"Unknown role {role!r}")
+        # Knowing a skill implies knowing its prerequisites, so inputs that
+        # close to the same set share a cache entry
+        return self._plan(self.closure(mask), role)
+
+    def _compute_plan(self, have: int, role: str) -> dict:
+        spec = self.roles[role]
+        missing = spec["mask"] & ~have
+        stage_of = {}
+        stages: List[List[dict]] = []
+        for skill in spec["order"]:
+            if not missing >> skill & 1:
+                continue
+            # One stage after the latest missing prerequisite
+            stage = 1 + max((stage_of[p] for p in self.prerequisites[skill] if p in stage_of), default=0)
+            stage_of[skill] = stage
+            if stage > len(stages):
+                stages.append([])
+            stages[stage - 1].append({
+                "skill": self.names[skill],
+                "prerequisites": [self.names[p] for p in self.prerequisites[skill]],
+            })
+        total = bin(spec["mask"]).count("1")
+        return {
+            "role": role,
+            "title": spec["title"],
+            "have": [self.names[s] for s in spec["order"] if have >> s & 1],
+            "progress": round(100 * (total - len(stage_of)) / total) if total else 100,
+            "stages": [{"stage": i + 1, "skills": skills} for i, skills in enumerate(stages)],
+        }
+
+
+_graph: Optional[SkillGraph] = None
+_graph_lock = threading.Lock()
+
+
+def load_graph(path: Optional[str] = None) -> SkillGraph:
+    with open(path or settings.SKILL_GRAPH_PATH, encoding="utf-8") as f:
+        return SkillGraph(json.load(f))
+
+
+def get_graph() -> SkillGraph:
+    """The compiled skill graph, built on first use"""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = load_graph()
+    return _graph
@@ -0,0 +1,59 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from database import get_db, replicas
+import models, schemas, auth, bulk_export, bulk_import, interview_bank, jobs
+import ats_scoring  # noqa: F401 (registers the ats.rescore job handler)
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.post("/users/import", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def import_users(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    batch_size: int = Query(bulk_import.DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    admin: models.User = Depends(auth.get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Queue a job that bulk imports users from a CSV or NDJSON upload; poll /jobs/{id} for the result"""
+    fmt = format or bulk_import.detect_format(file.filename)
+    path = bulk_import.spool(file.file, fmt)
+    job = jobs.enqueue(
+        db, "users.import", {"path": path, "format": fmt, "batch_size": batch_size}, priority=10, user_id=admin.id
+    )
+    return jobs.describe(job)
+
+@router.get("/users/export")
+def export_users(
+    format: Literal["csv", "ndjson"] = Query("ndjson"),
+    gzip: bool = Query(False),
+    include_content: bool = Query(False),
+    batch_size: int = Query(bulk_export.DEFAULT_BATCH_SIZE, ge=100, le=10000),
+    admin: models.User = Depends(auth.get_admin_user)
+):
+    """Stream every user with their profile and resumes as NDJSON or CSV"""
+    # The body is produced after this returns, on the export's own connections
+    chunks = bulk_export.export(format, gzip, replicas.route(), batch_size, include_content)
+    filename = f"users.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/ats/rescore", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def rescore_resumes(admin: models.User = Depends(auth.get_admin_user), db: Session = Depends(get_db)):
+    """Queue a job that reloads the ATS keyword sets and rescores every parsed resume; poll /jobs/{id}"""
+    job = jobs.enqueue(db, "ats.rescore", priority=10, user_id=admin.id)
+    return jobs.describe(job)
+
+@router.post("/interviews/reload", response_model=schemas.InterviewBankSummary)
+def reload_interview_bank(admin: models.User = Depends(auth.get_admin_user)):
+    """Recompile the interview question bank; every worker maps the new file on its next request"""
+    try:
+        interview_bank.compile_bank()
+    except (interview_bank.BankError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid question bank: {e}")
+    return interview_bank.reload().summary()
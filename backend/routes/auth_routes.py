@@ -1,25 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from database import get_db
-import models, schemas, auth
+from starlette.concurrency import run_in_threadpool
+from database import get_read_session, get_session, run_db
+import models, schemas, auth, admission, availability
+from activity import activity_log, REGISTER, LOGIN, LOGIN_FAILED
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-@router.post("/register", response_model=schemas.Token)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    """Register new user"""
-    # Check if user exists with either email or username
-    db_user_email = db.query(models.User).filter(models.User.email == user.email).first()
-    db_user_username = db.query(models.User).filter(models.User.username == user.username).first()
-    
-    if db_user_email or db_user_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User already registered"
-        )
-    
-    # Hash password and create user
-    hashed_password = auth.hash_password(user.password)
+# The handlers below are async so that bcrypt runs in the hashing pool without
+# holding a threadpool worker; DB work goes through run_db. They, and the
+# availability check, pass through admission control before doing any work. Activity events are queued and
+# written in the background, so they add no database round trip.
+
+def _user_exists(db: Session, email: str, username: str) -> bool:
+    # schemas.UserCreate lowercases both, as they are stored
+    db_user_email = db.query(models.User).filter(models.User.email == email).first()
+    db_user_username = db.query(models.User).filter(models.User.username == username).first()
+    return bool(db_user_email or db_user_username)
+
+def _create_user(db: Session, user: schemas.UserCreate, hashed_password: str) -> models.User:
     db_user = models.User(
         username=user.username,
         email=user.email, 
@@ -33,6 +34,46 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db_profile = models.Profile(user_id=db_user.id)
     db.add(db_profile)
     db.commit()
+    # Reload here so the response isn't lazily refreshed on the event loop
+    db.refresh(db_user)
+    return db_user
+
+def _find_user(db: Session, login: str):
+    # Usernames and emails are stored lowercase
+    login = login.strip().lower()
+    # Check if login is email or username
+    if "@" in login:
+        return db.query(models.User).filter(models.User.email == login).first()
+    return db.query(models.User).filter(models.User.username == login).first()
+
+def _rehash(db: Session, db_user: models.User, old_hash: str, new_hash: str):
+    # Only replace the hash that was verified, in case the password changed meanwhile
+    db.execute(
+        update(models.User)
+        .where(models.User.id == db_user.id, models.User.password_hash == old_hash)
+        .values(password_hash=new_hash)
+        .execution_options(synchronize_session=False, invalidate_users=[db_user.id])
+    )
+    db.commit()
+    db.refresh(db_user)
+
+@router.post("/register", response_model=schemas.Token)
+async def register_user(user: schemas.UserCreate, request: Request, db: Session = Depends(get_session)):
+    """Register new user"""
+    admission.admit_register(request)
+    
+    # Check if user exists with either email or username
+    if await run_db(db, _user_exists, user.email, user.username):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User already registered"
+        )
+    
+    # Hash password and create user
+    hashed_password = await auth.hash_password_async(user.password)
+    db_user = await run_db(db, _create_user, user, hashed_password)
+    availability.index.add(db_user.username, db_user.email)
+    activity_log.record(REGISTER, db_user.id, admission.client_ip(request))
     
     # Create access token
     access_token = auth.create_access_token(data={"sub": db_user.email})
@@ -43,25 +84,55 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         "user": db_user
     }
 
+@router.get("/available", response_model=schemas.Availability)
+async def check_available(
+    request: Request,
+    username: Optional[str] = Query(None, min_length=1, max_length=255),
+    email: Optional[str] = Query(None, min_length=1, max_length=255),
+    db: Session = Depends(get_read_session)
+):
+    """Whether a username and/or email is free, for as-you-type signup checks"""
+    admission.admit_availability(request)
+    if username is None and email is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass a username or email to check"
+        )
+    index = availability.index
+    if index.sync_due():
+        await run_in_threadpool(index.sync)
+    
+    result = {}
+    for kind, value in (("username", username), ("email", email)):
+        if value is None:
+            continue
+        taken = index.lookup(kind, value)
+        if taken is None:
+            taken = await run_db(db, availability.exists, kind, value)
+        result[kind] = not taken
+    return result
+
 @router.post("/login", response_model=schemas.Token)
-def login_user(user: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login_user(user: schemas.UserLogin, request: Request, db: Session = Depends(get_session)):
     """Login user with username or email"""
-    # Check if login is email or username
-    is_email = "@" in user.login
+    admission.admit_login(request, user.login)
     
-    if is_email:
-        # Login via email
-        db_user = db.query(models.User).filter(models.User.email == user.login).first()
-    else:
-        # Login via username
-        db_user = db.query(models.User).filter(models.User.username == user.login).first()
+    db_user = await run_db(db, _find_user, user.login)
     
-    if not db_user or not auth.verify_password(user.password, db_user.password_hash):
+    verified, new_hash = False, None
+    if db_user:
+        verified, new_hash = await auth.verify_and_update_password_async(user.password, db_user.password_hash)
+    if not verified:
+        activity_log.record(LOGIN_FAILED, db_user.id if db_user else None, admission.client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    if new_hash:
+        # Stored at another bcrypt cost; move it to the configured one
+        await run_db(db, _rehash, db_user, db_user.password_hash, new_hash)
+    activity_log.record(LOGIN, db_user.id, admission.client_ip(request))
     access_token = auth.create_access_token(data={"sub": db_user.email})
     
     return {
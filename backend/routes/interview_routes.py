@@ -1,11 +1,65 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from database import get_db
-import models, auth
+from database import get_session, run_db
+import models, schemas, auth, interview_bank
 
 router = APIRouter(prefix="/interviews", tags=["interviews"])
 
-@router.get("/")
-def get_interviews(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    """Get user's interviews (placeholder)"""
-    return {"message": "Interview routes coming soon", "user_id": current_user.id}
\ No newline at end of file
+MAX_QUESTIONS = 20
+
+# Questions come from the memory-mapped bank in interview_bank.py; the
+# database holds answers and each user's position in the question order.
+
+def _record_answers(db: Session, user_id: int, answers: list) -> int:
+    db.execute(
+        insert(models.InterviewAnswer),
+        [{"user_id": user_id, "question_id": a.question_id, "answer": a.answer} for a in answers],
+    )
+    db.commit()
+    return len(answers)
+
+@router.get("/", response_model=schemas.InterviewBankSummary)
+async def get_interviews(current_user: models.User = Depends(auth.get_current_user)):
+    """Roles, skill tags and difficulty levels available for interview practice"""
+    return interview_bank.get_bank().summary()
+
+@router.get("/questions", response_model=schemas.InterviewQuestionSet)
+async def get_questions(
+    role: Optional[str] = Query(None),
+    difficulty: Optional[str] = Query(None),
+    tag: Optional[str] = Query(None),
+    count: int = Query(5, ge=1, le=MAX_QUESTIONS),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_session)
+):
+    """A random set of practice questions the user hasn't been served yet"""
+    try:
+        questions, remaining = await run_db(
+            db, interview_bank.sample, current_user.id, count, role, difficulty, tag.lower() if tag else None
+        )
+    except interview_bank.BankError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not questions:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No questions match these filters"
+        )
+    return {"questions": questions, "remaining": remaining}
+
+@router.post("/answers", response_model=schemas.InterviewAnswerResult, status_code=status.HTTP_201_CREATED)
+async def record_answers(
+    batch: schemas.InterviewAnswerBatch,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_session)
+):
+    """Record a batch of answers with a single insert"""
+    bank = interview_bank.get_bank()
+    unknown = sorted({a.question_id for a in batch.answers if bank.position(a.question_id) is None})
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown question ids: {unknown}"
+        )
+    return {"recorded": await run_db(db, _record_answers, current_user.id, batch.answers)}
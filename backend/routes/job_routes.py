@@ -0,0 +1,64 @@
+import asyncio
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import get_read_session, run_db
+import models, schemas, auth, jobs
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+def _list_jobs(db: Session, user_id: int, limit: int):
+    rows = db.query(models.Job).filter(models.Job.user_id == user_id).order_by(
+        models.Job.created_at.desc(), models.Job.id.desc()
+    ).limit(limit).all()
+    return [jobs.describe(job) for job in rows]
+
+async def _visible_job(job_id: int, user: models.User) -> dict:
+    # Read on a fresh connection: job rows are updated by other threads and processes
+    job = await run_in_threadpool(jobs.load, job_id)
+    if job is None or (job["user_id"] != user.id and user.email not in settings.ADMIN_EMAILS):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+@router.get("/", response_model=List[schemas.JobResponse])
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_session)
+):
+    """The user's jobs, newest first"""
+    return await run_db(db, _list_jobs, current_user.id, limit)
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+async def get_job(job_id: int, current_user: models.User = Depends(auth.get_current_user)):
+    """Status, progress and result of a job"""
+    return jobs.describe(await _visible_job(job_id, current_user))
+
+@router.get("/{job_id}/events")
+async def stream_job(job_id: int, request: Request, current_user: models.User = Depends(auth.get_current_user)):
+    """Server-sent events with the job's state each time it changes, until it finishes"""
+    job = await _visible_job(job_id, current_user)
+
+    async def events(job: dict):
+        last = None
+        while job is not None:
+            body = schemas.JobResponse.model_validate(jobs.describe(job)).model_dump_json()
+            if body != last:
+                yield f"event: job\ndata: {body}\n\n"
+                last = body
+            if job["status"] in jobs.FINISHED or await request.is_disconnected():
+                return
+            await asyncio.sleep(settings.JOB_STREAM_INTERVAL_SECONDS)
+            job = await run_in_threadpool(jobs.load, job_id)
+
+    return StreamingResponse(
+        events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
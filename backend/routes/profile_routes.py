@@ -1,39 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
-from database import get_db
-import models, schemas, auth
+from config import settings
+from cache import TTLCache
+from database import get_read_session, get_session, run_db
+import models, schemas, auth, search, skills
+from activity import activity_log, PROFILE_UPDATE
+from admission import client_ip
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
+# user id -> (revision, etag, serialized ProfileResponse), so unchanged reads
+# skip both the profile SELECT and JSON encoding
+profile_cache = TTLCache(settings.PROFILE_CACHE_MAX_ENTRIES, settings.PROFILE_CACHE_TTL_SECONDS)
+
+def _cache_profile(user_id: int, entry: tuple):
+    # A read that started before an update can finish after it; never replace a newer revision
+    cached = profile_cache.get(user_id)
+    if cached is None or cached[0] < entry[0]:
+        profile_cache.set(user_id, entry)
+
+def _etag(profile: models.Profile) -> str:
+    return f'"p{profile.id}-r{profile.revision}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _serialize(profile: models.Profile):
+    body = schemas.ProfileResponse.model_validate(profile).model_dump_json().encode()
+    return profile.revision, _etag(profile), body
+
+def _get_profile(db: Session, user_id: int):
+    return db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
+
+def _load_serialized(db: Session, user_id: int):
+    profile = _get_profile(db, user_id)
+    return _serialize(profile) if profile else None
+
+def _update_profile(db: Session, user_id: int, changes: dict):
+    profile = _get_profile(db, user_id)
+    if not profile:
+        return None
+
+    # Update fields
+    for field, value in changes.items():
+        setattr(profile, field, value)
+    # Incremented in SQL so concurrent updates can't both write the same revision
+    profile.revision = models.Profile.revision + 1
+
+    # Keep the search document and the normalized skills in step with the profile
+    search.index_profile(db, profile)
+    parsed = None
+    if "skills" in changes:
+        parsed = skills.replace_profile_skills(db.connection(), {profile.id: profile.skills})
+    db.commit()
+    if parsed is not None:
+        skills.skill_index.update(parsed)
+    # Reload the committed row, so the ETag's revision and the body belong together
+    db.refresh(profile)
+    return _serialize(profile)
+
+def _profile_response(etag: str, body: bytes, if_none_match: Optional[str] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/", response_model=schemas.ProfileResponse)
-def get_profile(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def get_profile(
+    if_none_match: Optional[str] = Header(None),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_session)
+):
     """Get user profile"""
-    profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
-        )
-    return profile
+    cached = profile_cache.get(current_user.id)
+    if cached is None:
+        cached = await run_db(db, _load_serialized, current_user.id)
+        if cached is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        _cache_profile(current_user.id, cached)
+    _, etag, body = cached
+    return _profile_response(etag, body, if_none_match)
 
 @router.put("/", response_model=schemas.ProfileResponse)
-def update_profile(
+async def update_profile(
     profile_data: schemas.ProfileUpdate,
+    request: Request,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """Update user profile"""
-    profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-    if not profile:
+    profile_cache.pop(current_user.id)
+    changes = profile_data.dict(exclude_unset=True)
+    updated = await run_db(db, _update_profile, current_user.id, changes)
+    if not updated:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
-    
-    # Update fields
-    for field, value in profile_data.dict(exclude_unset=True).items():
-        setattr(profile, field, value)
-    
-    db.commit()
-    db.refresh(profile)
-    return profile
\ No newline at end of file
+    activity_log.record(PROFILE_UPDATE, current_user.id, client_ip(request), fields=sorted(changes))
+    _cache_profile(current_user.id, updated)
+    _, etag, body = updated
+    return _profile_response(etag, body)
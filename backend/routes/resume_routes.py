@@ -1,11 +1,185 @@
-from fastapi import APIRouter, Depends
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from database import get_db
-import models, auth
+from database import get_read_session, get_session, run_db
+import models, schemas, auth, ats_scoring, resume_parser, resume_storage
+from activity import activity_log, RESUME_UPLOAD
+from admission import client_ip
 
 router = APIRouter(prefix="/resumes", tags=["resumes"])
 
-@router.get("/")
-def get_resumes(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    """Get user's resumes (placeholder)"""
-    return {"message": "Resume routes coming soon", "user_id": current_user.id}
\ No newline at end of file
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Columns returned by listings; parsed_content is only added on request
+_LISTING_COLUMNS = [
+    models.Resume.id,
+    models.Resume.profile_id,
+    models.Resume.filename,
+    models.Resume.content_hash,
+    models.Resume.file_size,
+    models.Resume.status,
+    models.Resume.ats_score,
+    models.Resume.created_at,
+]
+
+def _encode_cursor(created_at: datetime, resume_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), resume_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, resume_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(resume_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _profile_id(db: Session, user_id: int):
+    profile = db.query(models.Profile.id).filter(models.Profile.user_id == user_id).first()
+    return profile[0] if profile else None
+
+def _create_resume(db: Session, profile_id: int, stored: resume_storage.StoredFile, user_id: int):
+    # The same file uploaded twice by one profile maps to the same resume
+    existing = db.query(models.Resume).filter(
+        models.Resume.profile_id == profile_id,
+        models.Resume.content_hash == stored.content_hash,
+    ).first()
+    if existing:
+        return existing, False
+    
+    resume = models.Resume(
+        profile_id=profile_id,
+        filename=stored.filename,
+        file_path=stored.path,
+        content_hash=stored.content_hash,
+        file_size=stored.size,
+        status=resume_parser.PENDING,
+    )
+    db.add(resume)
+    # Commits the resume and its parse job together, so neither exists without the other
+    resume_parser.enqueue(db, resume, user_id)
+    db.refresh(resume)
+    return resume, True
+
+def _list_resumes(db: Session, profile_id: int, after, limit: int, include_content: bool):
+    columns = _LISTING_COLUMNS + ([models.Resume.parsed_content] if include_content else [])
+    query = select(*columns).where(models.Resume.profile_id == profile_id)
+    if after is not None:
+        # Newest first: continue strictly below the (created_at, id) cursor
+        created_at, resume_id = after
+        query = query.where(or_(
+            models.Resume.created_at < created_at,
+            and_(models.Resume.created_at == created_at, models.Resume.id < resume_id),
+        ))
+    query = query.order_by(models.Resume.created_at.desc(), models.Resume.id.desc()).limit(limit + 1)
+    rows = [dict(row) for row in db.execute(query).mappings()]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return {"items": rows, "next_cursor": next_cursor}
+
+def _get_resume(db: Session, profile_id: int, resume_id: int):
+    return db.query(models.Resume).filter(
+        models.Resume.id == resume_id,
+        models.Resume.profile_id == profile_id,
+    ).first()
+
+async def _require_profile_id(db: Session, user_id: int) -> int:
+    profile_id = await run_db(db, _profile_id, user_id)
+    if profile_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile_id
+
+@router.post("/", response_model=schemas.ResumeResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_resume(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_session)
+):
+    """Upload a resume (multipart field "file"); parsing happens in the background"""
+    profile_id = await _require_profile_id(db, current_user.id)
+    try:
+        stored = await resume_storage.receive_upload(request)
+    except resume_storage.UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Resume file is too large"
+        )
+    except resume_storage.InvalidUpload as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    resume, created = await run_db(db, _create_resume, profile_id, stored, current_user.id)
+    activity_log.record(
+        RESUME_UPLOAD, current_user.id, client_ip(request),
+        resume_id=resume.id, file_size=stored.size, duplicate=not created,
+    )
+    return resume
+
+@router.get("/", response_model=schemas.ResumePage, response_model_exclude_unset=True)
+async def get_resumes(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_content: bool = Query(False, description="Include parsed_content in each item"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_session)
+):
+    """Get user's resumes, newest first, one page at a time"""
+    after = _decode_cursor(cursor) if cursor else None
+    profile_id = await _require_profile_id(db, current_user.id)
+    return await run_db(db, _list_resumes, profile_id, after, limit, include_content)
+
+@router.get("/{resume_id}", response_model=schemas.ResumeDetail)
+async def get_resume(resume_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_read_session)):
+    """Get a resume with its parsing status and extracted text"""
+    profile_id = await _require_profile_id(db, current_user.id)
+    resume = await run_db(db, _get_resume, profile_id, resume_id)
+    if not resume:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Resume not found"
+        )
+    return resume
+
+@router.get("/{resume_id}/ats", response_model=schemas.AtsReport)
+async def get_ats_report(
+    resume_id: int,
+    role: Optional[str] = Query(None, description="Role key to score against (defaults to the best match)"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_session)
+):
+    """Get ATS score and keyword recommendations for a parsed resume"""
+    profile_id = await _require_profile_id(db, current_user.id)
+    resume = await run_db(db, _get_resume, profile_id, resume_id)
+    if not resume:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Resume not found"
+        )
+    if resume.parsed_content is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Resume has not been parsed yet"
+        )
+    index = ats_scoring.get_index()
+    if role is not None and role not in index.titles:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown role; expected one of: {', '.join(index.roles)}"
+        )
+    return index.score(resume.parsed_content, role)
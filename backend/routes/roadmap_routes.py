@@ -0,0 +1,50 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from database import get_read_session, run_db
+from skills import split_skills
+import models, schemas, auth, ats_scoring, roadmap
+
+router = APIRouter(prefix="/roadmap", tags=["roadmap"])
+
+def _profile_inputs(db: Session, user_id: int):
+    return db.query(models.Profile.skills, models.Profile.career_goals).filter(
+        models.Profile.user_id == user_id
+    ).first()
+
+@router.get("/roles", response_model=List[schemas.RoadmapRole])
+async def list_roles(current_user: models.User = Depends(auth.get_current_user)):
+    """Roles a roadmap can target"""
+    graph = roadmap.get_graph()
+    return [
+        {"role": role, "title": spec["title"], "skills": len(spec["order"])}
+        for role, spec in graph.roles.items()
+    ]
+
+@router.get("/", response_model=schemas.Roadmap)
+async def get_roadmap(
+    role: Optional[str] = Query(None, description="Target role; defaults to the one named in the profile's career goals"),
+    skills: Optional[str] = Query(None, description="Comma-separated skills; defaults to the profile's skills"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_session)
+):
+    """Staged learning path from the user's skills to a target role"""
+    if skills is None or role is None:
+        profile = await run_db(db, _profile_inputs, current_user.id)
+        if skills is None:
+            skills = profile.skills if profile else None
+        if role is None and profile is not None:
+            role = ats_scoring.get_index().role_for(profile.career_goals)
+    if role is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass a role or name one in your profile's career goals"
+        )
+
+    graph = roadmap.get_graph()
+    mask, unknown = graph.skill_mask(split_skills(skills))
+    try:
+        plan = graph.plan(mask, role)
+    except roadmap.GraphError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {**plan, "unknown_skills": unknown}
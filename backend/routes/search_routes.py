@@ -0,0 +1,25 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from database import get_read_session, run_db
+import models, schemas, auth, search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=schemas.SearchResults)
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[Literal["profile", "resume"]] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    admin: models.User = Depends(auth.get_admin_user),
+    db: Session = Depends(get_read_session)
+):
+    """Search profile skills/goals and resume text, best matches first"""
+    if search.backend() is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not available for this database"
+        )
+    hits = await run_db(db, search.search, q, page_size, (page - 1) * page_size, type)
+    return {"query": q, "page": page, "page_size": page_size, "hits": hits}
@@ -0,0 +1,30 @@
+from itertools import islice
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from database import get_read_session, run_db
+import models, schemas, auth, skills
+
+router = APIRouter(prefix="/skills", tags=["skills"])
+
+def _find_profiles(db: Session, all_of, any_of):
+    return skills.find_profiles(db.connection(), all_of, any_of)
+
+@router.get("/profiles", response_model=schemas.SkillProfileMatches)
+async def find_profiles(
+    all_skills: Optional[str] = Query(None, alias="all", description="Comma-separated skills a profile must have"),
+    any_skills: Optional[str] = Query(None, alias="any", description="Comma-separated skills a profile needs at least one of"),
+    limit: int = Query(100, ge=1, le=1000),
+    admin: models.User = Depends(auth.get_admin_user),
+    db: Session = Depends(get_read_session)
+):
+    """Profiles by skill set, e.g. ?all=python,sql,docker"""
+    all_of, any_of = skills.split_skills(all_skills), skills.split_skills(any_skills)
+    if not all_of and not any_of:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass at least one skill in all or any"
+        )
+    result = await run_db(db, _find_profiles, all_of, any_of)
+    matches = result.pop("matches")
+    return {**result, "total": len(matches), "profile_ids": list(islice(matches, limit))}
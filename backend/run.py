@@ -1,23 +1,71 @@
 #!/usr/bin/env python3
 """
-Short command to run the FastAPI server
+Production server launcher.
+
+Brings the schema up to date once, then serves main:app from
+WEB_CONCURRENCY worker processes. Uses gunicorn with the app preloaded
+(settings from gunicorn.conf.py) where it is available, and falls back to
+uvicorn's own worker manager elsewhere (e.g. Windows).
 """
-import uvicorn
+import os
+import runpy
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONFIG = os.path.join(os.path.dirname(BACKEND_DIR), "gunicorn.conf.py")
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn doesn't run on Windows
+    BaseApplication = None
+
+
+if BaseApplication is not None:
+    class GunicornServer(BaseApplication):
+        """gunicorn configured from gunicorn.conf.py, without going through its CLI"""
+
+        def load_config(self):
+            for key, value in runpy.run_path(GUNICORN_CONFIG).items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            # Picks up WEB_CONCURRENCY from backend/.env as well as the environment
+            from config import settings
+            self.cfg.set("workers", settings.WEB_CONCURRENCY)
+
+        def load(self):
+            from main import app
+            return app
+
+
+def main():
+    os.chdir(BACKEND_DIR)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from config import settings
 
-if __name__ == "__main__":
-    import os
     port = int(os.environ.get("PORT", 8000))
-    print(f"🚀 Starting server on port {port}")
+    print(f"🚀 Starting server on port {port} with {settings.WEB_CONCURRENCY} workers")
     print(f"🌐 Host: 0.0.0.0")
     print(f"📁 Working directory: {os.getcwd()}")
-    
+
+    if BaseApplication is not None:
+        # gunicorn.conf.py's on_starting hook runs the migrations in the master
+        GunicornServer().run()
+        return
+
+    import uvicorn
+    import migrations
+    migrations.prepare()
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=port,
+        workers=settings.WEB_CONCURRENCY,
         reload=False,
         log_level="info",
         access_log=True
     )
 
 
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 import re
 
@@ -27,7 +27,13 @@ class UserCreate(BaseModel):
             raise ValueError('Username must be no more than 20 characters long')
         if not re.match(r'^[a-zA-Z0-9_]+$', value):
             raise ValueError('Username can only contain letters, numbers, and underscores')
-        return value.strip()
+        # Stored lowercase, so lookups are case-insensitive with plain indexed equality
+        return value.strip().lower()
+
+    @field_validator('email')
+    @classmethod
+    def email_lowercase(cls, value):
+        return value.lower()
 
     @field_validator('password')
     @classmethod
@@ -93,8 +99,145 @@ class ProfileResponse(BaseModel):
         """Get profile initial from email"""
         return self.email[0].upper()
 
+# Resume Schemas
+class ResumeResponse(BaseModel):
+    id: int
+    profile_id: int
+    filename: str
+    content_hash: Optional[str] = None
+    file_size: Optional[int] = None
+    status: str
+    ats_score: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ResumeDetail(ResumeResponse):
+    parsed_content: Optional[str] = None
+
+class ResumePage(BaseModel):
+    items: List[ResumeDetail]
+    next_cursor: Optional[str] = None
+
+class AtsReport(BaseModel):
+    role: str
+    title: str
+    score: int
+    matched_keywords: List[str]
+    missing_keywords: List[str]
+    role_scores: Dict[str, int]
+
+# Job Schemas
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    progress: int
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    run_at: datetime
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# Search Schemas
+class SearchHit(BaseModel):
+    doc_type: str
+    doc_id: int
+    profile_id: int
+    score: float
+    snippet: str
+
+class SearchResults(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    hits: List[SearchHit]
+
+# Interview Schemas
+class InterviewBankSummary(BaseModel):
+    questions: int
+    roles: Dict[str, int]
+    tags: List[str]
+    difficulties: List[str]
+
+class InterviewQuestion(BaseModel):
+    id: int
+    role: str
+    difficulty: str
+    tags: List[str]
+    text: str
+
+class InterviewQuestionSet(BaseModel):
+    questions: List[InterviewQuestion]
+    # Unseen questions left before this filter starts repeating
+    remaining: int
+
+class InterviewAnswerCreate(BaseModel):
+    question_id: int
+    answer: str = Field(min_length=1, max_length=10000)
+
+class InterviewAnswerBatch(BaseModel):
+    answers: List[InterviewAnswerCreate] = Field(min_length=1, max_length=50)
+
+class InterviewAnswerResult(BaseModel):
+    recorded: int
+
+# Roadmap Schemas
+class RoadmapSkill(BaseModel):
+    skill: str
+    prerequisites: List[str]
+
+class RoadmapStage(BaseModel):
+    stage: int
+    skills: List[RoadmapSkill]
+
+class Roadmap(BaseModel):
+    role: str
+    title: str
+    have: List[str]
+    progress: int
+    stages: List[RoadmapStage]
+    unknown_skills: List[str]
+
+class RoadmapRole(BaseModel):
+    role: str
+    title: str
+    skills: int
+
+# Skill Index Schemas
+class SkillProfileMatches(BaseModel):
+    skills: List[str]
+    unknown_skills: List[str]
+    total: int
+    profile_ids: List[int]
+
+# Availability Schema (None for a field that wasn't asked about)
+class Availability(BaseModel):
+    username: Optional[bool] = None
+    email: Optional[bool] = None
+
 # Auth Token Schema
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
-    user: UserResponse
\ No newline at end of file
+    user: UserResponse
+
+# Bulk Import Schemas
+class BulkImportError(BaseModel):
+    line: int
+    email: Optional[str] = None
+    username: Optional[str] = None
+    error: str
+
+class BulkImportResult(BaseModel):
+    created: int
+    failed: int
+    errors: List[BulkImportError]
+    # Only the first bulk_import.MAX_REPORTED_ERRORS errors are listed
+    errors_truncated: bool = False
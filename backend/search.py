@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Full-text search over profile skills/goals and parsed resume content.
+
+Documents live in a search_documents table: an FTS5 virtual table on SQLite
+or an InnoDB table with a FULLTEXT index on MySQL. Each profile and each
+resume is one document whose row id encodes its type, so updating a document
+is a delete and insert by primary key. Documents are refreshed in the same
+transaction as the profile update or resume parse that changed them.
+
+Usage:
+    python search.py --rebuild   # re-index every profile and resume
+"""
+
+import argparse
+import re
+from typing import Optional
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from config import settings
+from database import engine
+import models
+
+PROFILE = "profile"
+RESUME = "resume"
+_TYPE_CODES = {PROFILE: 0, RESUME: 1}
+
+SNIPPET_CHARS = 160
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# InnoDB's default full-text stopwords; these are never indexed, so requiring one matches nothing
+_MYSQL_STOPWORDS = frozenset(
+    "a about an are as at be by com de en for from how i in is it la of on or "
+    "that the this to was what when where who will with und www".split()
+)
+
+
+def backend() -> Optional[str]:
+    """'sqlite' or 'mysql', or None when the database has no supported full-text index"""
+    url = settings.database_url
+    if url.startswith("sqlite"):
+        return "sqlite"
+    if url.startswith("mysql"):
+        return "mysql"
+    return None
+
+
+def _row_id(doc_type: str, doc_id: int) -> int:
+    return doc_id * 2 + _TYPE_CODES[doc_type]
+
+
+def create_index(conn: Connection):
+    """Create the search_documents table if it doesn't exist"""
+    kind = backend()
+    if kind == "sqlite":
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5("
+            "doc_type UNINDEXED, doc_id UNINDEXED, profile_id UNINDEXED, body, "
+            "tokenize = 'porter unicode61')"
+        ))
+    elif kind == "mysql":
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS search_documents ("
+            "id BIGINT PRIMARY KEY, doc_type VARCHAR(16) NOT NULL, doc_id INTEGER NOT NULL, "
+            "profile_id INTEGER NOT NULL, body MEDIUMTEXT, FULLTEXT KEY ft_body (body)"
+            ") ENGINE=InnoDB"
+        ))
+
+
+def _id_column() -> str:
+    # FTS5 tables are keyed by their implicit rowid
+    return "rowid" if backend() == "sqlite" else "id"
+
+
+def _insert(conn: Connection, documents: list):
+    """Insert (doc_type, doc_id, profile_id, body) documents with executemany"""
+    params = [
+        {"id": _row_id(doc_type, doc_id), "doc_type": doc_type, "doc_id": doc_id,
+         "profile_id": profile_id, "body": body}
+        for doc_type, doc_id, profile_id, body in documents if body.strip()
+    ]
+    if params:
+        conn.execute(text(
+            f"INSERT INTO search_documents ({_id_column()}, doc_type, doc_id, profile_id, body) "
+            "VALUES (:id, :doc_type, :doc_id, :profile_id, :body)"
+        ), params)
+
+
+def _write(conn: Connection, doc_type: str, doc_id: int, profile_id: int, body: str):
+    conn.execute(
+        text(f"DELETE FROM search_documents WHERE {_id_column()} = :id"),
+        {"id": _row_id(doc_type, doc_id)},
+    )
+    _insert(conn, [(doc_type, doc_id, profile_id, body)])
+
+
+def profile_body(profile) -> str:
+    return "\n".join(part for part in (profile.skills, profile.career_goals, profile.education) if part)
+
+
+def index_profile(db: Session, profile: models.Profile):
+    """Refresh a profile's document in the current transaction"""
+    if backend() is not None:
+        _write(db.connection(), PROFILE, profile.id, profile.id, profile_body(profile))
+
+
+def index_resume(db: Session, resume: models.Resume):
+    """Refresh a resume's document in the current transaction"""
+    if backend() is not None:
+        _write(db.connection(), RESUME, resume.id, resume.profile_id, resume.parsed_content or "")
+
+
+def _match_query(query: str):
+    """Turn free text into an all-terms query for the backend, or None if nothing is searchable"""
+    words = _WORD.findall(query.lower())
+    if not words:
+        return None
+    if backend() == "sqlite":
+        return " ".join(f'"{word}"' for word in words)
+    # MySQL never indexes stopwords or short words, so only require the others
+    required = [
+        word for word in words
+        if len(word) >= settings.SEARCH_MIN_TOKEN_SIZE and word not in _MYSQL_STOPWORDS
+    ]
+    return " ".join(f"+{word}" for word in required) or None
+
+
+def _snippet(body: str, words: list) -> str:
+    lowered = body.lower()
+    positions = [lowered.find(word) for word in words if lowered.find(word) >= 0]
+    start = max(0, min(positions) - SNIPPET_CHARS // 4) if positions else 0
+    snippet = body[start:start + SNIPPET_CHARS].replace("\n", " ")
+    return ("..." if start else "") + snippet + ("..." if start + SNIPPET_CHARS < len(body) else "")
+
+
+def search(db: Session, query: str, limit: int, offset: int, doc_type: Optional[str] = None) -> list:
+    """Ranked hits (best first) for documents containing every query term"""
+    match = _match_query(query)
+    if match is None:
+        return []
+    params = {"match": match, "limit": limit, "offset": offset, "doc_type": doc_type}
+    type_filter = "AND doc_type = :doc_type " if doc_type else ""
+    if backend() == "sqlite":
+        # bm25() is lower for better matches
+        sql = (
+            "SELECT doc_type, doc_id, profile_id, body, -bm25(search_documents) AS score "
+            "FROM search_documents WHERE search_documents MATCH :match " + type_filter +
+            "ORDER BY bm25(search_documents) LIMIT :limit OFFSET :offset"
+        )
+    else:
+        sql = (
+            "SELECT doc_type, doc_id, profile_id, body, "
+            "MATCH(body) AGAINST(:match IN BOOLEAN MODE) AS score "
+            "FROM search_documents WHERE MATCH(body) AGAINST(:match IN BOOLEAN MODE) " + type_filter +
+            "ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        )
+    words = _WORD.findall(query.lower())
+    return [
+        {
+            "doc_type": row.doc_type,
+            "doc_id": int(row.doc_id),
+            "profile_id": int(row.profile_id),
+            "score": float(row.score),
+            "snippet": _snippet(row.body or "", words),
+        }
+        for row in db.execute(text(sql), params)
+    ]
+
+
+def rebuild(batch_size: int = 500) -> int:
+    """Re-index every profile and resume, one transaction per batch"""
+    if backend() is None:
+        raise RuntimeError("Full-text search needs a SQLite or MySQL database")
+    with engine.begin() as conn:
+        create_index(conn)
+        conn.execute(text("DELETE FROM search_documents"))
+
+    queries = (
+        (PROFILE, select(
+            models.Profile.id, models.Profile.id,
+            models.Profile.skills, models.Profile.career_goals, models.Profile.education,
+        ), models.Profile.id),
+        (RESUME, select(
+            models.Resume.id, models.Resume.profile_id, models.Resume.parsed_content,
+        ), models.Resume.id),
+    )
+    indexed = 0
+    for doc_type, query, key in queries:
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(query.where(key > last_id).order_by(key).limit(batch_size)).all()
+                if not rows:
+                    break
+                _insert(conn, [
+                    (doc_type, row[0], row[1], "\n".join(part for part in row[2:] if part))
+                    for row in rows
+                ])
+            indexed += len(rows)
+            last_id = rows[-1][0]
+    return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search index tools")
+    parser.add_argument("--rebuild", action="store_true", help="re-index all profiles and resumes")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Indexed {rebuild(batch_size=args.batch_size)} documents.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Skill dictionary and profile skill index.
+
+Free-text Profile.skills is normalized into canonical skills: each entry is
+cleaned up, resolved through the alias table and interned into the skills
+table, and the profile's set is stored in profile_skills whenever the profile
+is updated.
+
+Each worker also keeps a bitmap per skill over profile ids (chunked, so
+rarely used skills stay small), built from profile_skills on first use and
+kept current by the worker's own updates plus a periodic sync of recently
+updated profiles. "Profiles with all of {python, sql, docker}" is then an
+intersection of three bitmaps.
+"""
+import json
+import re
+import threading
+import time
+from datetime import timedelta
+from functools import reduce
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, func, insert, select, type_coerce
+from sqlalchemy.engine import Connection
+from config import settings
+import models
+
+_SEPARATORS = re.compile(r"[,;\n|•]+")
+MAX_NAME_LENGTH = 100
+
+
+def normalize(skill: str) -> str:
+    """Lowercase with single spaces and no surrounding punctuation"""
+    return " ".join(skill.lower().split()).strip(" .-*")
+
+
+def split_skills(text: Optional[str]) -> List[str]:
+    """Split a free-text skills field (comma, semicolon or line separated)"""
+    return [part for part in (normalize(p) for p in _SEPARATORS.split(text or "")) if part]
+
+
+# Dictionary
+
+class Dictionary:
+    """Cached name -> id and alias -> canonical name lookups for the skills tables"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.aliases: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def canonical(self, conn: Connection, name: str) -> str:
+        if self.aliases is None:
+            rows = conn.execute(
+                select(models.SkillAlias.alias, models.Skill.name)
+                .join(models.Skill, models.Skill.id == models.SkillAlias.skill_id)
+            ).all()
+            self.aliases = {alias: canonical for alias, canonical in rows}
+        return self.aliases.get(name, name)
+
+    def intern(self, conn: Connection, names: Iterable[str]) -> Dict[str, int]:
+        """Canonical ids for skill names, adding skills that aren't in the table yet"""
+        resolved = {}
+        for name in names:
+            name = normalize(name)
+            if name and len(name) <= MAX_NAME_LENGTH:
+                resolved[name] = self.canonical(conn, name)
+        wanted = set(resolved.values())
+        with self._lock:
+            missing = wanted - self.ids.keys()
+        if missing:
+            found = self._lookup(conn, missing)
+            new = missing - found.keys()
+            if new:
+                self._insert(conn, new)
+                found.update(self._lookup(conn, new))
+            with self._lock:
+                self.ids.update(found)
+        with self._lock:
+            return {name: self.ids[canonical] for name, canonical in resolved.items()}
+
+    def find(self, conn: Connection, name: str) -> Optional[int]:
+        """Id of an existing skill by canonical name, without adding it"""
+        with self._lock:
+            if name not in self.ids:
+                self.ids.update(self._lookup(conn, {name}))
+            return self.ids.get(name)
+
+    @staticmethod
+    def _lookup(conn: Connection, names: set) -> Dict[str, int]:
+        rows = conn.execute(select(models.Skill.name, models.Skill.id).where(models.Skill.name.in_(names)))
+        return dict(rows.all())
+
+    @staticmethod
+    def _insert(conn: Connection, names: set):
+        # Another worker may add the same skill concurrently; skip duplicates
+        statement = (
+            insert(models.Skill.__table__)
+            .prefix_with("OR IGNORE", dialect="sqlite")
+            .prefix_with("IGNORE", dialect="mysql")
+        )
+        conn.execute(statement, [{"name": name} for name in sorted(names)])
+
+
+dictionary = Dictionary()
+
+
+def seed_dictionary(conn: Connection, path: Optional[str] = None):
+    """Add the skills and aliases from the skill graph file to the tables"""
+    with open(path or settings.SKILL_GRAPH_PATH, encoding="utf-8") as f:
+        graph = json.load(f)
+    ids = dictionary.intern(conn, graph["skills"])
+    existing = set(conn.execute(select(models.SkillAlias.alias)).scalars())
+    aliases = [
+        {"alias": normalize(alias), "skill_id": ids[normalize(target)]}
+        for alias, target in graph.get("aliases", {}).items()
+        if normalize(alias) not in existing
+    ]
+    if aliases:
+        conn.execute(insert(models.SkillAlias.__table__), aliases)
+    dictionary.aliases = None
+
+
+def replace_profile_skills(conn: Connection, skills_by_profile: Dict[int, Optional[str]]) -> Dict[int, frozenset]:
+    """Store each profile's parsed skills in profile_skills; returns profile id -> skill ids"""
+    ids = dictionary.intern(conn, {name for text in skills_by_profile.values() for name in split_skills(text)})
+    parsed = {
+        profile_id: frozenset(ids[name] for name in split_skills(text) if name in ids)
+        for profile_id, text in skills_by_profile.items()
+    }
+    table = models.ProfileSkill.__table__
+    conn.execute(delete(table).where(table.c.profile_id.in_(list(parsed))))
+    rows = [{"profile_id": profile_id, "skill_id": skill_id}
+            for profile_id, skill_ids in parsed.items() for skill_id in sorted(skill_ids)]
+    if rows:
+        conn.execute(insert(table), rows)
+    return parsed
+
+
+# Bitmap index
+
+CHUNK_BITS = 16
+
+
+class Bitmap:
+    """A set of non-negative ints stored as 64Ki-bit chunks"""
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: Optional[dict] = None):
+        self.chunks: Dict[int, int] = chunks or {}
+
+    def add(self, value: int):
+        key = value >> CHUNK_BITS
+        self.chunks[key] = self.chunks.get(key, 0) | (1 << (value & ((1 << CHUNK_BITS) - 1)))
+
+    def discard(self, value: int):
+        key = value >> CHUNK_BITS
+        chunk = self.chunks.get(key, 0) & ~(1 << (value & ((1 << CHUNK_BITS) - 1)))
+        if chunk:
+            self.chunks[key] = chunk
+        else:
+            self.chunks.pop(key, None)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        small, large = sorted((self, other), key=lambda b: len(b.chunks))
+        chunks = {}
+        for key, chunk in small.chunks.items():
+            both = chunk & large.chunks.get(key, 0)
+            if both:
+                chunks[key] = both
+        return Bitmap(chunks)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        chunks = dict(self.chunks)
+        for key, chunk in other.chunks.items():
+            chunks[key] = chunks.get(key, 0) | chunk
+        return Bitmap(chunks)
+
+    def __len__(self) -> int:
+        return sum(chunk.bit_count() for chunk in self.chunks.values())
+
+    def __iter__(self):
+        for key in sorted(self.chunks):
+            chunk, base = self.chunks[key], key << CHUNK_BITS
+            while chunk:
+                low = chunk & -chunk
+                yield base + low.bit_length() - 1
+                chunk ^= low
+
+
+class SkillIndex:
+    """Per-skill bitmaps of profile ids"""
+
+    # Re-read profiles updated this long before the last sync, covering
+    # second-resolution timestamps and clock skew between writers
+    SYNC_OVERLAP_SECONDS = 5
+
+    def __init__(self):
+        self._bitmaps: Dict[int, Bitmap] = {}
+        self._profiles: Dict[int, frozenset] = {}
+        self._loaded = False
+        self._synced_at = None  # database time of the last sync
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _database_now(conn: Connection):
+        return conn.execute(select(type_coerce(func.now(), models.Timestamp))).scalar()
+
+    def _set(self, profile_id: int, skill_ids: frozenset):
+        old = self._profiles.get(profile_id, frozenset())
+        for skill_id in old - skill_ids:
+            self._bitmaps[skill_id].discard(profile_id)
+        for skill_id in skill_ids - old:
+            self._bitmaps.setdefault(skill_id, Bitmap()).add(profile_id)
+        if skill_ids:
+            self._profiles[profile_id] = skill_ids
+        else:
+            self._profiles.pop(profile_id, None)
+
+    def load(self, conn: Connection):
+        """Build the index from profile_skills"""
+        synced_at = self._database_now(conn)
+        skills_by_profile: Dict[int, set] = {}
+        for profile_id, skill_id in conn.execute(
+            select(models.ProfileSkill.profile_id, models.ProfileSkill.skill_id)
+        ):
+            skills_by_profile.setdefault(profile_id, set()).add(skill_id)
+        with self._lock:
+            self._bitmaps, self._profiles = {}, {}
+            for profile_id, skill_ids in skills_by_profile.items():
+                self._set(profile_id, frozenset(skill_ids))
+            self._loaded, self._synced_at, self._checked_at = True, synced_at, time.monotonic()
+
+    def sync(self, conn: Connection):
+        """Load the index, or pick up profiles updated (e.g. by other workers) since the last sync"""
+        if not self._loaded:
+            self.load(conn)
+            return
+        if time.monotonic() - self._checked_at < settings.SKILL_INDEX_SYNC_SECONDS:
+            return
+        synced_at = self._database_now(conn)
+        since = self._synced_at - timedelta(seconds=self.SYNC_OVERLAP_SECONDS)
+        profile_ids = conn.execute(
+            select(models.Profile.id).where(models.Profile.updated_at >= since)
+        ).scalars().all()
+        changed = {profile_id: set() for profile_id in profile_ids}
+        if profile_ids:
+            for profile_id, skill_id in conn.execute(
+                select(models.ProfileSkill.profile_id, models.ProfileSkill.skill_id)
+                .where(models.ProfileSkill.profile_id.in_(profile_ids))
+            ):
+                changed[profile_id].add(skill_id)
+        with self._lock:
+            for profile_id, skill_ids in changed.items():
+                self._set(profile_id, frozenset(skill_ids))
+            self._synced_at, self._checked_at = synced_at, time.monotonic()
+
+    def update(self, parsed: Dict[int, frozenset]):
+        """Apply committed profile_skills changes from this worker"""
+        if not self._loaded:
+            return
+        with self._lock:
+            for profile_id, skill_ids in parsed.items():
+                self._set(profile_id, skill_ids)
+
+    def matching(self, all_of: Iterable[int] = (), any_of: Iterable[int] = ()) -> Bitmap:
+        """Profiles having every skill in all_of and, if given, at least one in any_of"""
+        all_of, any_of = list(all_of), list(any_of)
+        with self._lock:
+            empty = Bitmap()
+            result = None
+            if all_of:
+                # Smallest first keeps the intermediate results small
+                bitmaps = sorted((self._bitmaps.get(s, empty) for s in all_of), key=lambda b: len(b.chunks))
+                result = reduce(lambda a, b: a & b, bitmaps)
+            if any_of:
+                either = reduce(lambda a, b: a | b, (self._bitmaps.get(s, empty) for s in any_of))
+                result = either if result is None else result & either
+            return Bitmap(dict(result.chunks)) if result is not None else empty
+
+
+skill_index = SkillIndex()
+
+
+def find_profiles(conn: Connection, all_of: List[str], any_of: List[str] = ()) -> dict:
+    """Profile ids having all (and any) of the named skills, with the skills resolved"""
+    skill_index.sync(conn)
+    resolved, unknown = {}, []
+    for name in list(all_of) + list(any_of):
+        canonical = dictionary.canonical(conn, normalize(name))
+        skill_id = dictionary.find(conn, canonical)
+        if skill_id is not None:
+            resolved[name] = (canonical, skill_id)
+        else:
+            unknown.append(name)
+    if any(name in unknown for name in all_of) or (any_of and all(name in unknown for name in any_of)):
+        matches = Bitmap()
+    else:
+        matches = skill_index.matching(
+            [resolved[name][1] for name in all_of],
+            [resolved[name][1] for name in any_of if name in resolved],
+        )
+    return {
+        "skills": sorted({canonical for canonical, _ in resolved.values()}),
+        "unknown_skills": unknown,
+        "matches": matches,
+    }
@@ -1,9 +1,23 @@
 import os
 
 bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
-workers = 1
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
 worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app once in the master so workers (including ones recycled
+# after max_requests) fork with it already loaded
+preload_app = True
 timeout = 120
 keepalive = 2
 max_requests = 1000
 max_requests_jitter = 100
+
+
+def on_starting(server):
+    # Runs once in the master before any worker boots
+    import migrations
+    migrations.prepare()
+
+
+def post_fork(server, worker):
+    from database import reset_pools
+    reset_pools()
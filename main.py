@@ -4,27 +4,20 @@ Main entry point for Railway/Render deployment
 """
 import os
 import sys
-import subprocess
 
 def main():
     print("🚀 Starting AI Career Toolkit API...")
     
-    # Change to backend directory
-    backend_dir = os.path.join(os.getcwd(), 'backend')
-    if os.path.exists(backend_dir):
-        os.chdir(backend_dir)
-        print(f"📁 Changed to directory: {os.getcwd()}")
-    else:
+    backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+    if not os.path.exists(backend_dir):
         print("❌ Backend directory not found!")
         sys.exit(1)
     
-    # Start the FastAPI app
+    # Start the FastAPI app in this process; run.py changes into backend/
+    sys.path.insert(0, backend_dir)
     try:
-        print("🔥 Starting FastAPI server...")
-        subprocess.run([sys.executable, "run.py"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error starting server: {e}")
-        sys.exit(1)
+        import run
+        run.main()
     except KeyboardInterrupt:
         print("🛑 Server stopped by user")
         sys.exit(0)
@@ -725,6 +725,39 @@ const AuthModal = ({ onClose, onNavigate }) => {
   const [errors, setErrors] = useState({});
   const { setUser } = useAppStore();
 
+  // Flag taken usernames/emails while the user types (debounced)
+  useEffect(() => {
+    if (!isSignUp) return;
+    const checkUsername = /^[a-zA-Z0-9_]{3,20}$/.test(username);
+    const checkEmail = /\S+@\S+\.\S+/.test(email);
+    if (!checkUsername && !checkEmail) return;
+
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const authService = await import('./services/authService');
+        const available = await authService.checkAvailability({
+          username: checkUsername ? username : undefined,
+          email: checkEmail ? email.trim() : undefined
+        }, controller.signal);
+        setErrors(prev => {
+          const next = { ...prev };
+          if (available.username === false) next.username = 'Username is already taken';
+          else if (next.username === 'Username is already taken') delete next.username;
+          if (available.email === false) next.email = 'An account with this email already exists';
+          else if (next.email === 'An account with this email already exists') delete next.email;
+          return next;
+        });
+      } catch {
+        // Advisory only; registration reports conflicts anyway
+      }
+    }, 300);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [isSignUp, username, email]);
+
   const clearForm = () => {
     setUsername('');
     setEmail('');
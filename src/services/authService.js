@@ -48,6 +48,19 @@ export async function register({ username, email, password }) {
   return data;
 }
 
+// As-you-type signup check; resolves to { username, email } booleans (true = free)
+export async function checkAvailability({ username, email }, signal) {
+  const params = new URLSearchParams();
+  if (username) params.set('username', username);
+  if (email) params.set('email', email);
+  const res = await fetch(`${API_BASE}/auth/available?${params}`, {
+    method: 'GET',
+    headers: getHeaders(),
+    signal
+  });
+  return handleResponse(res);
+}
+
 export async function login({ login, password }) {
   const res = await fetch(`${API_BASE}/auth/login`, {
     method: 'POST',
@@ -4,11 +4,9 @@ Railway start script
 """
 import os
 import sys
-import subprocess
 
-# Change to backend directory
-os.chdir('backend')
-
-# Run the FastAPI app
+# Run the FastAPI app in this process (run.py changes into backend/ itself)
 if __name__ == "__main__":
-    subprocess.run([sys.executable, "run.py"])
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    import run
+    run.main()